@@ -1,5 +1,11 @@
 import json
 import re
+import os
+import sys
+
+# The vocabulary store lives next to the other pipeline scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from vocabulary_store import STORE_FILE, JSON_FILE, open_vocabulary
 
 def extract_sentence_pairs(examples_text):
     """
@@ -29,34 +35,39 @@ def extract_sentence_pairs(examples_text):
     
     return sentence_pairs
 
-def extract_all_examples(input_file, output_file):
+def extract_all_examples(store_file, output_file, json_file=JSON_FILE):
     """
-    Extract all examples from the vocabulary JSON file and save as a new JSON file.
+    Extract all examples from the vocabulary store and save as a new JSON file.
     
     Args:
-        input_file (str): Path to the input vocabulary JSON file
+        store_file (str): Path to the vocabulary store
         output_file (str): Path to the output examples JSON file
+        json_file (str): JSON database imported if the store is still empty
     """
     try:
-        # Read the vocabulary file
-        with open(input_file, 'r', encoding='utf-8') as f:
-            vocabulary_data = json.load(f)
+        # Open the vocabulary store
+        if not os.path.exists(store_file) and not os.path.exists(json_file):
+            raise FileNotFoundError(store_file)
+        store = open_vocabulary(store_file, json_file)
         
         all_sentences = {}
         processed_count = 0
         
         # Process each word entry
-        for word, word_data in vocabulary_data.items():
-            if 'examples' in word_data and word_data['examples']:
-                examples = word_data['examples']
-                sentences = extract_sentence_pairs(examples)
+        try:
+            for word, word_data in store.entries():
+                if 'examples' in word_data and word_data['examples']:
+                    examples = word_data['examples']
+                    sentences = extract_sentence_pairs(examples)
                 
-                # Add to the master dictionary
-                all_sentences.update(sentences)
+                    # Add to the master dictionary
+                    all_sentences.update(sentences)
                 
-                if sentences:
-                    processed_count += 1
-                    print(f"Processed '{word}': found {len(sentences)} sentence pairs")
+                    if sentences:
+                        processed_count += 1
+                        print(f"Processed '{word}': found {len(sentences)} sentence pairs")
+        finally:
+            store.close()
         
         # Save the extracted sentences
         with open(output_file, 'w', encoding='utf-8') as f:
@@ -68,15 +79,15 @@ def extract_all_examples(input_file, output_file):
         print(f"Results saved to: {output_file}")
         
     except FileNotFoundError:
-        print(f"Error: Could not find input file '{input_file}'")
+        print(f"Error: Could not find input file '{store_file}'")
     except json.JSONDecodeError:
-        print(f"Error: Invalid JSON format in '{input_file}'")
+        print(f"Error: Invalid JSON format in '{json_file}'")
     except Exception as e:
         print(f"Error: {str(e)}")
 
 if __name__ == "__main__":
     # Default file paths - you can modify these as needed
-    input_file = "new_system/data/top_words_database.json"  # Change this to your vocabulary file path
+    input_file = STORE_FILE  # Change this to your vocabulary store path
     output_file = "finnish_sentences_for_deck.json"
     
     print("Extracting Finnish sentences and English translations...")
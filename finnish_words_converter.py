@@ -1,7 +1,12 @@
-import json
 import csv
 import re
 import os
+import sys
+import argparse
+
+# The vocabulary store lives next to the other pipeline scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from vocabulary_store import STORE_FILE, JSON_FILE, ARCHIVE_FILE, ARCHIVE_SNAPSHOT_FILE, open_vocabulary
 
 def count_words(phrase):
     """Count the number of words in a Finnish phrase."""
@@ -40,21 +45,37 @@ def convert_csv_to_json(csv_file):
     
     return finnish_data
 
-def save_to_json_file(data, filename="data/top_words_database.json"):
-    """Save the data to a JSON file."""
-    filepath = f"c:\\Users\\JAMK\\Documents\\GitHub\\anki-cards-maker\\{filename}"
-    
+def save_to_store(data, store_file=STORE_FILE, export_json=False):
+    """Save the data to the vocabulary store, touching only these words; export_json also rewrites the JSON and archive snapshots."""
     # Create directory if it doesn't exist
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    os.makedirs(os.path.dirname(store_file), exist_ok=True)
     
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+    store = open_vocabulary(store_file, JSON_FILE, ARCHIVE_FILE)
+    try:
+        # Words of the current top list get their texts in the store; every other word
+        # keeps them in the cold archive until a frequency merge brings it onto the list
+        store.set_translations((word, entry["english_translation"]) for word, entry in data.items())
+        store.set_examples((word, entry["examples"]) for word, entry in data.items())
+        archived = store.archive_texts((word, entry["phrase_word_count"], entry["english_translation"], entry["examples"])
+                                       for word, entry in data.items())
+        if export_json:
+            store.export_json(JSON_FILE)
+            store.export_archive(ARCHIVE_SNAPSHOT_FILE)
+    finally:
+        store.close()
     
-    print(f"Finnish words data saved to: {filepath}")
-    return filepath
+    print(f"Finnish words data saved to: {store_file} ({archived} words outside the top list kept in {ARCHIVE_FILE})")
+    if export_json:
+        print(f"JSON snapshot exported to: {JSON_FILE}")
+        print(f"Archive snapshot exported to: {ARCHIVE_SNAPSHOT_FILE}")
+    return store_file
 
 def main():
     """Main function to convert and save the Finnish words data."""
+    parser = argparse.ArgumentParser(description='Save the translations and examples of the examples CSV to the vocabulary store')
+    parser.add_argument('--export-json', action='store_true', help=f'Also rewrite the versioned snapshots {JSON_FILE} and {ARCHIVE_SNAPSHOT_FILE}')
+    args = parser.parse_args()
+    
     print("Converting Finnish words CSV to JSON structure...")
     
     # Convert from CSV file
@@ -65,8 +86,8 @@ def main():
         print("No data to save. Please check your CSV file.")
         return
     
-    # Save to file
-    save_to_json_file(finnish_data)
+    # Save to the vocabulary store
+    save_to_store(finnish_data, export_json=args.export_json)
     
     # Print sample output
     print(f"\nGenerated {len(finnish_data)} Finnish word entries.")
@@ -76,7 +97,7 @@ def main():
     
     print("\nData structure for each word:")
     print("- phrase_word_count: Number of words in the phrase")
-    print("- frequency_count: Set to 0 (to be updated later)")
+    print("- frequency_count: Set by merge_frequency_data.py; words not on the top list wait in the cold archive")
     print("- english_translation: Translation from CSV")
     print("- examples: Examples from CSV")
 
@@ -6,13 +6,24 @@ Creates Anki decks from CSV with Finnish, English, and Examples fields
 
 # pip install genanki
 import genanki
+import os
+import sys
 import csv
 import hashlib
+import argparse
+
+# The deck writing helpers live next to the other pipeline scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from deck_build_cache import IncrementalDeckBuild
+from deck_export import export_decks
 
 VERSION = '1.0.3'  # Version for output file naming
 INPUT_FILE = 'finnish_english_with_examples.csv'   # CSV with examples
 BATCH_SIZE = 200  # Number of words per batch
 OUTPUT_FILE = f'anki_deck/top_1k_finnish_words_v{VERSION}.apkg'  # Enhanced output file
+BUILD_CACHE = 'anki_deck/context_deck_build_cache.sqlite'  # Note hashes and collection of the last build
+BATCH_OUTPUT_FILE = f'anki_deck/top_1k_finnish_words_v{VERSION}_batch{{batch}}.apkg'  # One file per batch with --split
+BATCH_BUILD_CACHE = 'anki_deck/context_batch{batch}_deck_build_cache.sqlite'
 
 def generate_note_id(finnish_word):
     """Generate a stable note ID based on the Finnish word"""
@@ -90,7 +101,65 @@ def create_new_deck(batch_num):
         f'Top 1000 Finnish Words::Batch {batch_num} (Words {(batch_num-1)*BATCH_SIZE + 1}-{batch_num*BATCH_SIZE})'
     )
 
+def load_deck_rows():
+    """(number, finnish, english, examples) for every word of the deck, skipping failed examples"""
+    rows = []
+    with open(INPUT_FILE, 'r', encoding='utf-8') as csvfile:
+        csv_reader = csv.reader(csvfile)
+
+        # Skip header row
+        next(csv_reader, None)
+
+        for row in csv_reader:
+            if len(row) >= 4:  # Number, Finnish, English, Examples
+                number, finnish_word, english_translation, examples = row[:4]
+
+                # Skip failed examples
+                if examples.startswith('[') and examples.endswith(']'):
+                    print(f"Skipping failed examples: {finnish_word}")
+                    continue
+                rows.append((number, finnish_word, english_translation, examples))
+    return rows
+
+def build_batch_deck(rows, batch_num, full_rebuild=False):
+    """Write one batch to its own .apkg; runs in an export_decks() worker"""
+    output_file = BATCH_OUTPUT_FILE.format(batch=batch_num)
+    batch_rows = rows[(batch_num - 1) * BATCH_SIZE:batch_num * BATCH_SIZE]
+    deck = create_new_deck(batch_num)
+    build = IncrementalDeckBuild(output_file, BATCH_BUILD_CACHE.format(batch=batch_num), full_rebuild)
+    try:
+        build.add_deck(deck)
+        for number, finnish_word, english_translation, examples in batch_rows:
+            build.add_note(
+                deck, model,
+                [finnish_word, english_translation, examples, number],
+                guid=generate_note_id(finnish_word)
+            )
+        build.write()
+    finally:
+        build.close()
+    return output_file, len(batch_rows), build.summary()
+
+def export_batches(rows, workers=None, full_rebuild=False):
+    """Write every batch to its own .apkg, several batches at a time"""
+    batch_count = (len(rows) + BATCH_SIZE - 1) // BATCH_SIZE
+    jobs = [(batch_num, full_rebuild) for batch_num in range(1, batch_count + 1)]
+
+    for (batch_num, _), (output_file, size, summary) in export_decks(build_batch_deck, jobs, rows, workers):
+        start_word = (batch_num - 1) * BATCH_SIZE + 1
+        print(f"[OK] Batch {batch_num} (Words {start_word}-{start_word + size - 1}) - {size} cards: {output_file}")
+        print(f"     {summary}")
+
+    print(f"\nCreated {batch_count} batch decks with Tatoeba examples!")
+
 def main():
+    parser = argparse.ArgumentParser(description='Create the Anki deck from the examples CSV')
+    parser.add_argument('--cache', default=BUILD_CACHE, help=f'Path to the deck build cache (default: {BUILD_CACHE})')
+    parser.add_argument('--full-rebuild', action='store_true', help='Rebuild every note instead of only the changed ones')
+    parser.add_argument('--split', action='store_true', help='Write every batch to its own .apkg instead of one master deck')
+    parser.add_argument('--workers', type=int, default=None, help='Processes writing batch decks with --split (default: one per CPU)')
+    args = parser.parse_args()
+
     # Check if enhanced CSV exists, fallback to basic CSV
     try:
         with open(INPUT_FILE, 'r', encoding='utf-8'):
@@ -100,69 +169,67 @@ def main():
         print(f"Enhanced CSV not found: {INPUT_FILE}")
         print("Please run 'python tatoeba_examples.py' first to add example sentences!")
         return
-    
+
+    rows = load_deck_rows()
+    if args.split:
+        export_batches(rows, args.workers, args.full_rebuild)
+        return
+
+    # Only notes that changed since the previous build are rewritten
+    build = IncrementalDeckBuild(OUTPUT_FILE, args.cache, args.full_rebuild)
     current_batch = 1
     current_deck = None
     card_count = 0
     all_decks = []
-    
+    batch_sizes = []
+
     # Create first deck
     current_deck = create_new_deck(current_batch)
-    
-    with open(INPUT_FILE, 'r', encoding='utf-8') as csvfile:
-        csv_reader = csv.reader(csvfile)
-        
-        # Skip header row
-        next(csv_reader, None)
-        
-        for row in csv_reader:
-            if len(row) >= 4:  # Number, Finnish, English, Examples
-                number = row[0]
-                finnish_word = row[1]
-                english_translation = row[2]
-                examples = row[3]
-                
-                # Skip failed examples
-                if examples.startswith('[') and examples.endswith(']'):
-                    print(f"Skipping failed examples: {finnish_word}")
-                    continue
-                
-                # Check if we need to start a new batch
-                if card_count >= BATCH_SIZE:
-                    all_decks.append(current_deck)
-                    print(f"\nCompleted Batch {current_batch} with {card_count} cards")
-                    
-                    current_batch += 1
-                    current_deck = create_new_deck(current_batch)
-                    card_count = 0
-                    print(f"\nStarting Batch {current_batch}...")
-                
-                # Create note with examples
-                note = genanki.Note(
-                    model=model, 
-                    fields=[finnish_word, english_translation, examples, number],
-                    guid=generate_note_id(finnish_word)
-                )
-                current_deck.add_note(note)
-                card_count += 1
-                print(f"Added to Batch {current_batch}: {number}: {finnish_word} -> {english_translation}")
-        
-        # Add the last deck if it has cards
-        if card_count > 0:
+
+    for number, finnish_word, english_translation, examples in rows:
+        # Check if we need to start a new batch
+        if card_count >= BATCH_SIZE:
             all_decks.append(current_deck)
+            batch_sizes.append(card_count)
             print(f"\nCompleted Batch {current_batch} with {card_count} cards")
+
+            current_batch += 1
+            current_deck = create_new_deck(current_batch)
+            card_count = 0
+            print(f"\nStarting Batch {current_batch}...")
+
+        if card_count == 0:
+            build.add_deck(current_deck)
+
+        # Create note with examples
+        build.add_note(
+            current_deck, model,
+            [finnish_word, english_translation, examples, number],
+            guid=generate_note_id(finnish_word)
+        )
+        card_count += 1
+        print(f"Added to Batch {current_batch}: {number}: {finnish_word} -> {english_translation}")
+
+    # Add the last deck if it has cards
+    if card_count > 0:
+        all_decks.append(current_deck)
+        batch_sizes.append(card_count)
+        print(f"\nCompleted Batch {current_batch} with {card_count} cards")
     
     # Export all batches to a single .apkg file
-    package = genanki.Package(all_decks)
-    package.write_to_file(OUTPUT_FILE)
+    try:
+        build.write()
+    finally:
+        build.close()
     
     print(f"\nCreated enhanced master deck: {OUTPUT_FILE}")
+    print(build.summary())
     print(f"Contains {len(all_decks)} sub-decks with Tatoeba examples!")
     
-    for i, deck in enumerate(all_decks, 1):
+    for i, size in enumerate(batch_sizes, 1):
         start_word = (i-1) * BATCH_SIZE + 1
-        end_word = min(i * BATCH_SIZE, start_word + len(deck.notes) - 1)
-        print(f"  Finnish Words Enhanced::Batch {i} (Words {start_word}-{end_word}) - {len(deck.notes)} cards")
+        end_word = start_word + size - 1
+        print(f"  Finnish Words Enhanced::Batch {i} (Words {start_word}-{end_word}) - {size} cards")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
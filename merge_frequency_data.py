@@ -1,85 +1,94 @@
 import json
 import os
+import sys
+import argparse
+
+# The vocabulary store lives next to the other pipeline scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from json_stream import iter_object_items
+from vocabulary_store import STORE_FILE, JSON_FILE, ARCHIVE_FILE, ARCHIVE_SNAPSHOT_FILE, open_vocabulary
 
 def count_words(text):
     """Count the number of words in a phrase"""
     return len(text.strip().split())
 
-def merge_frequency_data():
+def read_frequency_snapshot(frequency_file):
+    """Yield (phrase, phrase_word_count, frequency_count) from the frequency file, one entry at a time"""
+    with open(frequency_file, 'rb') as f:
+        for finnish_word, freq_info in iter_object_items(f):
+            yield finnish_word, count_words(finnish_word), freq_info["frequency_count"]
+
+def merge_frequency_data(export_json=False):
     """
     Merge frequency data from top_finnish_words_frequency.json 
-    with the existing database in new_system/data/top_words_database.json
+    into the vocabulary store (new_system/data/top_words_database.sqlite);
+    words that fell off the list move to new_system/data/cold_words_archive.sqlite.
+    With export_json the versioned JSON and archive snapshots are rewritten afterwards.
     """
     
     # File paths
     frequency_file = "top_finnish_words_frequency.json"
-    database_file = "new_system/data/top_words_database.json"
     
-    try:
-        # Load frequency data
-        with open(frequency_file, 'r', encoding='utf-8') as f:
-            frequency_data = json.load(f)
-        print(f"Loaded {len(frequency_data)} words from frequency file")
-        
-        # Load existing database (if it exists)
-        if os.path.exists(database_file):
-            with open(database_file, 'r', encoding='utf-8') as f:
-                database = json.load(f)
-            print(f"Loaded {len(database)} words from existing database")
-        else:
-            database = {}
-            print("No existing database found, creating new one")
-            
-    except FileNotFoundError as e:
-        print(f"Error: Could not find file - {e}")
+    if not os.path.exists(frequency_file):
+        print(f"Error: Could not find file - {frequency_file}")
         return
+    
+    # Create directory if it doesn't exist
+    os.makedirs(os.path.dirname(STORE_FILE), exist_ok=True)
+    
+    # Open the store; the first run imports the existing JSON database
+    try:
+        store = open_vocabulary(STORE_FILE, JSON_FILE, ARCHIVE_FILE)
     except json.JSONDecodeError as e:
         print(f"Error: Invalid JSON format - {e}")
         return
     
-    # Merge logic
-    words_updated = 0
-    words_added = 0
-    
-    # Process each word from frequency data
-    for finnish_word, freq_info in frequency_data.items():
-        frequency_count = freq_info["frequency_count"]
-        
-        if finnish_word in database:
-            # Word exists in database - update frequency_count
-            database[finnish_word]["frequency_count"] = frequency_count
-            words_updated += 1
-        else:
-            # Word doesn't exist in database - add it
-            database[finnish_word] = {
-                "phrase_word_count": count_words(finnish_word),
-                "frequency_count": frequency_count,
-                "english_translation": "",
-                "examples": ""
-            }
-            words_added += 1
-    
-    # Create directory if it doesn't exist
-    os.makedirs(os.path.dirname(database_file), exist_ok=True)
-    
-    # Save updated database
     try:
-        with open(database_file, 'w', encoding='utf-8') as f:
-            json.dump(database, f, ensure_ascii=False, indent=2)
+        print(f"Loaded {len(store)} words from vocabulary store")
+        
+        # One bulk upsert: known words get their new count, new words are added (or come back
+        # from the cold archive with their translation and examples) and words that fell off
+        # the list move to the archive
+        report = store.merge_frequencies(read_frequency_snapshot(frequency_file))
+        snapshot_size = report['added'] + report['updated'] + report['unchanged']
         
         print(f"\n✅ Merge completed successfully!")
-        print(f"📊 Words updated: {words_updated}")
-        print(f"➕ Words added: {words_added}")
-        print(f"📁 Total words in database: {len(database)}")
-        print(f"💾 Database saved to: {database_file}")
+        print(f"📥 Words in frequency file: {snapshot_size}")
+        print(f"📊 Words updated: {report['updated']} ({report['unchanged']} unchanged)")
+        print(f"➕ Words added: {report['added']}" + (f" - {', '.join(report['added_words'])}" if report['added_words'] else ""))
+        if report['added'] > len(report['added_words']) > 0:
+            print(f"   ... and {report['added'] - len(report['added_words'])} more")
+        print(f"♻️  Words back from the archive: {report['promoted']}" + (f" - {', '.join(report['promoted_words'])}" if report['promoted_words'] else ""))
+        if report['promoted'] > len(report['promoted_words']) > 0:
+            print(f"   ... and {report['promoted'] - len(report['promoted_words'])} more")
+        print(f"➖ Words moved to the archive: {report['dropped']}" + (f" - {', '.join(report['dropped_words'])}" if report['dropped_words'] else ""))
+        if report['dropped'] > len(report['dropped_words']) > 0:
+            print(f"   ... and {report['dropped'] - len(report['dropped_words'])} more")
+        print(f"📁 Total words in database: {len(store)} ({store.archived_count()} archived)")
+        print(f"💾 Database saved to: {STORE_FILE}")
         
+        if export_json:
+            # Together, so a word moved to the archive never leaves both versioned files
+            store.export_json(JSON_FILE)
+            print(f"💾 JSON snapshot exported to: {JSON_FILE}")
+            store.export_archive(ARCHIVE_SNAPSHOT_FILE)
+            print(f"💾 Archive snapshot exported to: {ARCHIVE_SNAPSHOT_FILE}")
+        
+    except json.JSONDecodeError as e:
+        print(f"Error: Invalid JSON format - {e}")
     except Exception as e:
         print(f"Error saving database: {e}")
+    finally:
+        store.close()
 
 def main():
     """Main function to run the merge process"""
+    parser = argparse.ArgumentParser(description='Merge top_finnish_words_frequency.json into the vocabulary store')
+    parser.add_argument('--export-json', action='store_true', help=f'Also rewrite the versioned snapshots {JSON_FILE} and {ARCHIVE_SNAPSHOT_FILE}')
+    args = parser.parse_args()
+    
     print("🔄 Starting frequency data merge...")
-    merge_frequency_data()
+    merge_frequency_data(args.export_json)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,7 +1,12 @@
-import re
+import os
+import sys
 import json
-from collections import Counter
-from itertools import islice
+import argparse
+
+# The counting engine lives next to the other pipeline scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from ngram_counter import (CHUNK_SIZE, TIE_BREAKS, approximation_report, capacity_for, count_file,
+                            count_file_incremental, select_top_ngrams)
 
 def read_blacklist(blacklist_file):
     """Read blacklisted words and phrases from a file"""
@@ -18,34 +23,30 @@ def read_blacklist(blacklist_file):
         print(f"Warning: Blacklist file '{blacklist_file}' not found. Proceeding without blacklist.")
         return set()
 
-def get_ngrams(text, n, blacklist=None):
-    words = re.findall(r'\b\w+\b', text.lower())  # Extract words and convert to lowercase
-    ngrams = [' '.join(words[i:i+n]) for i in range(len(words)-n+1)]
-    if blacklist:
-        ngrams = [ngram for ngram in ngrams if ngram not in blacklist]  # Exclude blacklisted n-grams
-    return Counter(ngrams)
+def analyze_text(file_path, blacklist_file=None, min_frequency=1, chunk_size=CHUNK_SIZE, workers=1, index_file=None, rebuild=False,
+                 capacity=None, verify=False, tie_break='first-seen'):
+    blacklist = read_blacklist(blacklist_file) if blacklist_file else None
 
-def analyze_text(file_path, blacklist_file=None, min_frequency=1):
-    with open(file_path, 'r', encoding='utf-8') as file:
-        text = file.read()
+    # Stream the corpus in chunks and count 1- to 4-grams in a single pass
+    # (split into whitespace-aligned shards counted in parallel when workers > 1)
+    # With a capacity, 2- to 4-grams are approximate counts in bounded memory
+    if index_file:
+        # Only the text appended since the last run is counted
+        counter = count_file_incremental(file_path, index_file, max_n=4, chunk_size=chunk_size,
+                                         workers=workers, rebuild=rebuild, capacity=capacity)
+    else:
+        counter = count_file(file_path, max_n=4, chunk_size=chunk_size, workers=workers, capacity=capacity)
 
-    blacklist = read_blacklist(blacklist_file) if blacklist_file else None
+    # Filter by minimum frequency and blacklist, select the top 1000 by frequency
+    top_ngrams = select_top_ngrams(counter, 1000, min_frequency, blacklist, tie_break)
 
-    # Get most common n-grams and filter by minimum frequency
-    all_1_grams = get_ngrams(text, 1, blacklist)
-    all_2_grams = get_ngrams(text, 2, blacklist)
-    all_3_grams = get_ngrams(text, 3, blacklist)
-    all_4_grams = get_ngrams(text, 4, blacklist)
-    
-    # Combine all n-grams into a single list and filter by minimum frequency
-    all_ngrams = []
-    for ngram_dict in [all_1_grams, all_2_grams, all_3_grams, all_4_grams]:
-        for phrase, count in ngram_dict.items():
-            if count >= min_frequency:
-                all_ngrams.append((phrase, count))
-    
-    # Sort by frequency (descending) and limit to top 1000
-    top_ngrams = sorted(all_ngrams, key=lambda x: x[1], reverse=True)[:1000]
+    if capacity:
+        exact_top = None
+        if verify:
+            exact = count_file(file_path, max_n=4, chunk_size=chunk_size, workers=workers)
+            exact_top = select_top_ngrams(exact, 1000, min_frequency, blacklist, tie_break)
+        for line in approximation_report(counter, top_ngrams, 1000, exact_top):
+            print(f"[INFO] {line}")
 
     # Create JSON structure
     frequency_data = {}
@@ -63,8 +64,26 @@ def analyze_text(file_path, blacklist_file=None, min_frequency=1):
     print(f"[OK] Total entries: {len(frequency_data)}")
     print("[OK] Format: JSON with Finnish words as keys and frequency_count as values")
 
-# Usage
-file_path = "dataset.txt"  # Replace with your file path
-blacklist_file_path = "blacklist.txt"  # Replace with your blacklist file path if available
-min_frequency_threshold = 3  # Minimum frequency threshold (words/phrases with less than this count will be ignored)
-analyze_text(file_path, blacklist_file_path, min_frequency_threshold)
+def main():
+    parser = argparse.ArgumentParser(description='Count the most frequent words and phrases in the dataset')
+    parser.add_argument('--input', default='dataset.txt', help='Path to dataset file (default: dataset.txt)')
+    parser.add_argument('--blacklist', default='blacklist.txt', help='Path to blacklist file (default: blacklist.txt)')
+    parser.add_argument('--min-frequency', type=int, default=3, help='Words/phrases with less than this count will be ignored (default: 3)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help=f'Characters read per chunk while streaming the dataset (default: {CHUNK_SIZE})')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes counting shards of the dataset in parallel (default: 1)')
+    parser.add_argument('--index', default='ngram_index.pkl', help='Path to the stored n-gram counts used for incremental runs (default: ngram_index.pkl)')
+    parser.add_argument('--no-index', action='store_true', help='Recount the whole dataset without reading or writing the index')
+    parser.add_argument('--rebuild', action='store_true', help='Ignore the stored counts, recount the whole dataset and rewrite the index')
+    parser.add_argument('--epsilon', type=float, help='Approximate 2- to 4-gram counts, each at most epsilon * total too low')
+    parser.add_argument('--max-counters', type=int, help='Approximate 2- to 4-gram counts, tracking at most this many per order')
+    parser.add_argument('--verify', action='store_true', help='With approximate counts, also count exactly and compare the top lists')
+    parser.add_argument('--tie-break', choices=TIE_BREAKS, default='first-seen', help='Order of entries with equal counts (default: first-seen)')
+    args = parser.parse_args()
+
+    index_file = None if args.no_index else args.index
+    capacity = capacity_for(args.epsilon, args.max_counters)
+    analyze_text(args.input, args.blacklist, args.min_frequency, args.chunk_size, args.workers, index_file,
+                 args.rebuild, capacity, args.verify, args.tie_break)
+
+if __name__ == '__main__':
+    main()
@@ -6,13 +6,22 @@ Creates Anki decks from JSON database with Finnish words, translations, and exam
 
 # pip install genanki
 import genanki
+import os
+import sys
 import json
 import hashlib
+import argparse
+
+# The deck writing helpers live next to the other pipeline scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from deck_build_cache import IncrementalDeckBuild
+from vocabulary_store import STORE_FILE, open_vocabulary
 
 VERSION = '1.0.5'  # Version for output file naming
-INPUT_FILE = 'new_system/data/top_words_database.json'   # JSON database
+INPUT_FILE = 'new_system/data/top_words_database.json'   # JSON database, imported into an empty store
 BATCH_SIZE = 200  # Number of words per batch
 OUTPUT_FILE = f'anki_deck/top_1k_finnish_words_v{VERSION}.apkg'  # Enhanced output file
+BUILD_CACHE = 'anki_deck/json_deck_build_cache.sqlite'  # Note hashes and collection of the last build
 
 def generate_note_id(finnish_word):
     """Generate a stable note ID based on the Finnish word"""
@@ -91,81 +100,95 @@ def create_new_deck(batch_num):
     )
 
 def main():
-    # Load JSON database
-    try:
-        with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-            database = json.load(f)
-        print(f"Loaded {len(database)} words from JSON database")
-    except FileNotFoundError:
-        print(f"Database not found: {INPUT_FILE}")
+    parser = argparse.ArgumentParser(description='Create the Anki deck from the JSON word database')
+    parser.add_argument('--store', default=STORE_FILE, help=f'Path to the vocabulary store (default: {STORE_FILE})')
+    parser.add_argument('--input', default=INPUT_FILE, help=f'JSON database to import if the store is empty (default: {INPUT_FILE})')
+    parser.add_argument('--output', default=OUTPUT_FILE, help=f'Path to the output .apkg (default: {OUTPUT_FILE})')
+    parser.add_argument('--verbose', action='store_true', help='Print every added and skipped word')
+    parser.add_argument('--cache', default=BUILD_CACHE, help=f'Path to the deck build cache (default: {BUILD_CACHE})')
+    parser.add_argument('--full-rebuild', action='store_true', help='Rebuild every note instead of only the changed ones')
+    args = parser.parse_args()
+
+    # Words are read one at a time in frequency order, straight from the store's frequency index
+    if not os.path.exists(args.store) and not os.path.exists(args.input):
+        print(f"Database not found: {args.store}")
         print("Please run the merge script first to create the database!")
         return
+    try:
+        store = open_vocabulary(args.store, args.input)
     except json.JSONDecodeError as e:
         print(f"Error reading JSON database: {e}")
         return
+    print(f"Loaded {len(store)} words from vocabulary store")
     
-    # Sort words by frequency_count (descending) to get most frequent first
-    sorted_words = sorted(
-        database.items(), 
-        key=lambda x: x[1]['frequency_count'], 
-        reverse=True
-    )
-    
+    # Notes are written straight into the collection in bulk instead of as genanki.Note objects,
+    # starting from the previous build's collection so only changed notes are rewritten
+    build = IncrementalDeckBuild(args.output, args.cache, args.full_rebuild)
     current_batch = 1
-    current_deck = None
     card_count = 0
-    all_decks = []
+    batch_sizes = []
+    skipped = 0
     
     # Create first deck
     current_deck = create_new_deck(current_batch)
     
-    # Process each word in order of frequency
-    for rank, (finnish_word, word_data) in enumerate(sorted_words, 1):
-        english_translation = word_data.get('english_translation', '')
-        examples = word_data.get('examples', '')
-        frequency_count = word_data.get('frequency_count', 0)
-        
-        # Skip words without translation
-        if not english_translation.strip():
-            print(f"Skipping word without translation: {finnish_word}")
-            continue
-        
-        # Check if we need to start a new batch
-        if card_count >= BATCH_SIZE:
-            all_decks.append(current_deck)
-            print(f"\nCompleted Batch {current_batch} with {card_count} cards")
+    try:
+        # Process each word in order of frequency
+        for rank, finnish_word, word_data in store.ranked_entries():
+            english_translation = word_data.get('english_translation', '')
+            examples = word_data.get('examples', '')
+            frequency_count = word_data.get('frequency_count', 0)
+            
+            # Skip words without translation
+            if not english_translation.strip():
+                skipped += 1
+                if args.verbose:
+                    print(f"Skipping word without translation: {finnish_word}")
+                continue
+            
+            # Check if we need to start a new batch
+            if card_count >= BATCH_SIZE:
+                batch_sizes.append(card_count)
+                print(f"Completed Batch {current_batch} with {card_count} cards")
+                
+                current_batch += 1
+                current_deck = create_new_deck(current_batch)
+                card_count = 0
+            
+            if card_count == 0:
+                build.add_deck(current_deck)
             
-            current_batch += 1
-            current_deck = create_new_deck(current_batch)
-            card_count = 0
-            print(f"\nStarting Batch {current_batch}...")
+            # Create note with examples
+            build.add_note(
+                current_deck, model,
+                [finnish_word, english_translation, examples, str(rank)],
+                guid=generate_note_id(finnish_word)
+            )
+            card_count += 1
+            if args.verbose:
+                print(f"Added to Batch {current_batch}: #{rank}: {finnish_word} -> {english_translation} (freq: {frequency_count})")
         
-        # Create note with examples
-        note = genanki.Note(
-            model=model, 
-            fields=[finnish_word, english_translation, examples, str(rank)],
-            guid=generate_note_id(finnish_word)
-        )
-        current_deck.add_note(note)
-        card_count += 1
-        print(f"Added to Batch {current_batch}: #{rank}: {finnish_word} -> {english_translation} (freq: {frequency_count})")
-    
-    # Add the last deck if it has cards
-    if card_count > 0:
-        all_decks.append(current_deck)
-        print(f"\nCompleted Batch {current_batch} with {card_count} cards")
-    
-    # Export all batches to a single .apkg file
-    package = genanki.Package(all_decks)
-    package.write_to_file(OUTPUT_FILE)
+        # Add the last deck if it has cards
+        if card_count > 0:
+            batch_sizes.append(card_count)
+            print(f"Completed Batch {current_batch} with {card_count} cards")
+        
+        # Export all batches to a single .apkg file
+        build.write()
+    finally:
+        build.close()
+        store.close()
     
-    print(f"\nCreated enhanced master deck: {OUTPUT_FILE}")
-    print(f"Contains {len(all_decks)} sub-decks from JSON database!")
+    print(f"\nCreated enhanced master deck: {args.output}")
+    print(build.summary())
+    print(f"Contains {len(batch_sizes)} sub-decks from JSON database!")
+    if skipped:
+        print(f"Skipped {skipped} words without translation")
     
-    for i, deck in enumerate(all_decks, 1):
+    for i, size in enumerate(batch_sizes, 1):
         start_word = (i-1) * BATCH_SIZE + 1
-        end_word = min(i * BATCH_SIZE, start_word + len(deck.notes) - 1)
-        print(f"  Top Finnish Words::Batch {i} (Ranks {start_word}-{end_word}) - {len(deck.notes)} cards")
+        end_word = start_word + size - 1
+        print(f"  Top Finnish Words::Batch {i} (Ranks {start_word}-{end_word}) - {size} cards")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
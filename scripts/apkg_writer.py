@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Bulk .apkg writer for large decks.
+
+Produces the same collection as genanki.Package.write_to_file (genanki's
+schema, col row, note and card rows), but without a genanki.Note object
+per word: note and card rows are buffered and inserted with executemany
+in a single transaction, and the finished collection is streamed into
+the zip straight from disk.
+"""
+
+import os
+import json
+import time
+import shutil
+import sqlite3
+import zipfile
+import tempfile
+import itertools
+
+# pip install genanki
+import genanki
+from genanki.apkg_col import APKG_COL
+from genanki.apkg_schema import APKG_SCHEMA
+
+FLUSH_SIZE = 5000  # Notes buffered before they are inserted
+
+# Indexes are created after the bulk insert, which is much cheaper than maintaining them row by row
+_index_at = APKG_SCHEMA.index('CREATE INDEX')
+SCHEMA_TABLES, SCHEMA_INDEXES = APKG_SCHEMA[:_index_at], APKG_SCHEMA[_index_at:]
+
+
+def card_ords(model, fields):
+    """Template ords that produce a card for these fields, as genanki decides for front/back models"""
+    if model.model_type != model.FRONT_BACK:
+        return [card.ord for card in genanki.Note(model=model, fields=fields).cards]
+    return [card_ord for card_ord, any_or_all, required in model._req
+            if (any if any_or_all == 'any' else all)(fields[i] for i in required)]
+
+
+class ApkgWriter:
+    def __init__(self, output_file, timestamp=None, base_collection=None):
+        """
+        base_collection: a collection kept from an earlier build (see write()) to start
+        from instead of an empty one; its notes stay unless removed with remove_notes().
+        """
+        self.output_file = output_file
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.mod = int(self.timestamp)
+        self.decks = {}
+        self.models = {}
+        self.note_rows = []
+        self.card_rows = []
+        self.removed_ids = []
+        self.note_count = 0
+
+        # Build the collection next to the output file, so the zip step only streams it
+        fd, self.db_path = tempfile.mkstemp(suffix='.anki2', dir=os.path.dirname(os.path.abspath(output_file)))
+        os.close(fd)
+        if base_collection:
+            shutil.copyfile(base_collection, self.db_path)
+        self.conn = sqlite3.connect(self.db_path)
+        # A half-written temporary collection is thrown away anyway
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.indexed = bool(base_collection)
+        if not base_collection:
+            self.conn.executescript(SCHEMA_TABLES)
+            self.conn.executescript(APKG_COL)
+
+        # New ids must not collide with the ids of notes and cards kept from the base collection
+        last_id = self.conn.execute('SELECT MAX(m) FROM (SELECT MAX(id) AS m FROM notes '
+                                    'UNION ALL SELECT MAX(id) FROM cards)').fetchone()[0] or 0
+        self.id_gen = itertools.count(max(int(self.timestamp * 1000), last_id + 1))
+
+    def add_deck(self, deck):
+        """Register a genanki.Deck; its notes are added with add_note()"""
+        self.decks[deck.deck_id] = deck
+
+    def add_note(self, deck_id, model, fields, guid, tags=(), due=0):
+        """Queue a note and its cards for deck_id; returns the note id"""
+        self.models[model.model_id] = (model, deck_id)  # genanki keeps the last deck using the model
+        note_id = next(self.id_gen)
+        self.note_rows.append((
+            note_id, guid, model.model_id, self.mod, -1,
+            ' ' + ' '.join(tags) + ' ', '\x1f'.join(fields), fields[model.sort_field_index], 0, 0, ''
+        ))
+        for card_ord in card_ords(model, fields):
+            self.card_rows.append((
+                next(self.id_gen), note_id, deck_id, card_ord, self.mod, -1,
+                0, 0, due, 0, 0, 0, 0, 0, 0, 0, 0, ''
+            ))
+        self.note_count += 1
+        if len(self.note_rows) >= FLUSH_SIZE:
+            self.flush()
+        return note_id
+
+    def remove_notes(self, note_ids):
+        """Remove notes, and their cards, that came from the base collection"""
+        self.removed_ids.extend(note_ids)
+        if len(self.removed_ids) >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Apply the queued removals and insert the queued rows; they stay in the one open transaction until write()"""
+        self.conn.executemany('DELETE FROM cards WHERE nid = ?', ((note_id,) for note_id in self.removed_ids))
+        self.conn.executemany('DELETE FROM notes WHERE id = ?', ((note_id,) for note_id in self.removed_ids))
+        self.removed_ids.clear()
+        self.conn.executemany('INSERT INTO notes VALUES(?,?,?,?,?,?,?,?,?,?,?)', self.note_rows)
+        self.conn.executemany('INSERT INTO cards VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)', self.card_rows)
+        self.note_rows.clear()
+        self.card_rows.clear()
+
+    def write(self, keep_collection=None):
+        """
+        Finish the collection and zip it into the output .apkg.
+        With keep_collection the finished collection is also saved there, to be
+        passed as base_collection to the next build.
+        """
+        self.flush()
+        decks_json, models_json = self.conn.execute('SELECT decks, models FROM col').fetchone()
+        # Sub-decks of the base collection that were not registered again are dropped
+        decks = {deck_id: deck for deck_id, deck in json.loads(decks_json).items() if deck_id == '1'}
+        decks.update({str(deck_id): deck.to_json() for deck_id, deck in self.decks.items()})
+        models = json.loads(models_json)
+        models.update({str(model_id): model.to_json(self.timestamp, deck_id)
+                       for model_id, (model, deck_id) in self.models.items()})
+        self.conn.execute('UPDATE col SET decks = ?, models = ?', (json.dumps(decks), json.dumps(models)))
+        self.conn.commit()
+        if not self.indexed:
+            self.conn.executescript(SCHEMA_INDEXES)
+        self.conn.close()
+
+        with zipfile.ZipFile(self.output_file, 'w') as outzip:
+            outzip.write(self.db_path, 'collection.anki2')
+            outzip.writestr('media', json.dumps({}))
+        if keep_collection:
+            shutil.move(self.db_path, keep_collection)
+        else:
+            os.remove(self.db_path)
+
+    def close(self):
+        """Discard the temporary collection if write() was never reached"""
+        if os.path.exists(self.db_path):
+            self.conn.close()
+            os.remove(self.db_path)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark the HTML to text extraction of scraped posts:
+BeautifulSoup get_text() against the streaming html_text extractor.
+
+Runs on a saved Blogspot feed page (the JSON returned by
+/feeds/posts/default?alt=json). Use --blog to download and save one first:
+
+    python scripts\\benchmark_html_extraction.py --blog mumminmatkat.blogspot.com
+    python scripts\\benchmark_html_extraction.py --sample feed_sample.json --repeat 5
+"""
+
+import json
+import time
+import argparse
+from bs4 import BeautifulSoup
+
+from html_text import html_to_text
+from http_utils import make_session
+from blogspot_scraper import MAX_RESULTS, entry_html, fetch_page
+
+
+def extract_text_bs4(html_content):
+    soup = BeautifulSoup(html_content, "html.parser")
+    return soup.get_text(separator=" ", strip=True)
+
+
+def save_sample(blog_domain, sample_file):
+    session = make_session(pool_size=1)
+    try:
+        entries = fetch_page(blog_domain, 1, session)
+    finally:
+        session.close()
+    with open(sample_file, 'w', encoding='utf-8') as f:
+        json.dump({"feed": {"entry": entries}}, f, ensure_ascii=False)
+    print(f"[OK] Saved {len(entries)} feed entries from {blog_domain} to {sample_file}")
+
+
+def load_sample(sample_file):
+    with open(sample_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    entries = data.get("feed", {}).get("entry", []) if isinstance(data, dict) else data
+    return [html for html in map(entry_html, entries) if html]
+
+
+def time_extractor(extract, documents, repeat):
+    """Best wall time of `repeat` passes over all documents, and the texts of the last pass"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        texts = [extract(html) for html in documents]
+        best = min(best, time.perf_counter() - started)
+    return best, texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare BeautifulSoup and streaming HTML text extraction')
+    parser.add_argument('--sample', default='feed_sample.json', help='Saved feed JSON to benchmark on (default: feed_sample.json)')
+    parser.add_argument('--blog', help=f'Download the first {MAX_RESULTS} posts of this blog into --sample first')
+    parser.add_argument('--repeat', type=int, default=3, help='Passes per extractor, the best one is reported (default: 3)')
+    args = parser.parse_args()
+
+    if args.blog:
+        save_sample(args.blog, args.sample)
+
+    documents = load_sample(args.sample)
+    if not documents:
+        print(f"❌ No post HTML found in {args.sample}")
+        return
+    size_mb = sum(len(html.encode('utf-8')) for html in documents) / 1e6
+    print(f"Benchmarking on {len(documents)} posts ({size_mb:.1f} MB of HTML), best of {args.repeat}")
+
+    bs4_time, bs4_texts = time_extractor(extract_text_bs4, documents, args.repeat)
+    fast_time, fast_texts = time_extractor(html_to_text, documents, args.repeat)
+
+    print(f"BeautifulSoup: {bs4_time:.3f}s ({size_mb / bs4_time:.1f} MB/s)")
+    print(f"html_text:     {fast_time:.3f}s ({size_mb / fast_time:.1f} MB/s)")
+    print(f"Speedup:       {bs4_time / fast_time:.1f}x")
+
+    differing = sum(a != b for a, b in zip(bs4_texts, fast_texts))
+    words_bs4 = sum(len(text.split()) for text in bs4_texts)
+    words_fast = sum(len(text.split()) for text in fast_texts)
+    print(f"Identical output for {len(documents) - differing}/{len(documents)} posts "
+          f"({words_fast} words vs {words_bs4} with BeautifulSoup)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,15 @@
-import requests
-from bs4 import BeautifulSoup
 import os
+import json
+import argparse
+import threading
+import multiprocessing
+from itertools import chain
+from urllib.parse import urlsplit
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from http_utils import TokenBucket, get_with_retries, make_session
+from html_text import html_to_text
+from post_index import INDEX_FILE, PostIndex, content_hash, to_utc
 
 # List of Blogspot domains to scrape
 blogs = [
@@ -9,6 +18,10 @@ blogs = [
 ]
 
 SCRAPED_BLOGS_FILE = "scraped_blogs.txt"
+STATE_FILE = "scrape_state.json"
+FEED_URL = "https://{blog}/feeds/posts/default"
+MAX_RESULTS = 150  # Maximum allowed by Blogspot API
+EXTRACT_BATCH_SIZE = 25  # Posts per task sent to the extraction processes
 
 def load_scraped_blogs():
     """Load the list of already scraped blogs from file"""
@@ -22,89 +35,244 @@ def save_scraped_blog(blog_domain):
     with open(SCRAPED_BLOGS_FILE, 'a', encoding='utf-8') as f:
         f.write(blog_domain + '\n')
 
-def fetch_posts(blog_domain):
+class CrawlState:
     """
-    Fetch ALL posts via the Blogspot JSON feed using pagination.
+    Per-blog start-index cursors of unfinished blogs, checkpointed to disk
+    after every page so a crashed run resumes mid-blog.
     """
-    all_entries = []
-    start_index = 1
-    max_results = 150  # Maximum allowed by Blogspot API
-    
-    while True:
-        url = f"https://{blog_domain}/feeds/posts/default?alt=json&max-results={max_results}&start-index={start_index}"
-        print(f"  Fetching posts {start_index}-{start_index + max_results - 1}...")
-        
-        try:
-            resp = requests.get(url, timeout=10)
-            resp.raise_for_status()
-            data = resp.json()
-            
-            entries = data.get("feed", {}).get("entry", [])
-            if not entries:
-                break  # No more posts
-                
-            all_entries.extend(entries)
-            
-            # Check if we got fewer posts than requested (means we reached the end)
-            if len(entries) < max_results:
-                break
-                
-            start_index += max_results
-            
-        except Exception as e:
-            print(f"  Error fetching batch starting at {start_index}: {e}")
-            break
-    
-    return all_entries
+
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.cursors = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.cursors = json.load(f).get("cursors", {})
+
+    def start(self, blog_domains):
+        """Register blogs about to be crawled, so an interrupted run is recognised as one"""
+        with self.lock:
+            for blog_domain in blog_domains:
+                self.cursors.setdefault(blog_domain, 1)
+            self._save()
+
+    def cursor(self, blog_domain):
+        with self.lock:
+            return self.cursors.get(blog_domain, 1)
+
+    def advance(self, blog_domain, start_index):
+        with self.lock:
+            self.cursors[blog_domain] = start_index
+            self._save()
+
+    def finish(self, blog_domain):
+        with self.lock:
+            self.cursors.pop(blog_domain, None)
+            self._save()
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"cursors": self.cursors}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+class PostWriter:
+    """
+    Thread-safe writer that streams extracted posts to the output file as they arrive.
+    Posts are always appended: text_cleaner moves the file aside once it consumes it,
+    and posts already in the index are never fetched again. The file is only open
+    while a page is written, so that move never catches a crawl holding it open.
+    """
+
+    def __init__(self, filename="text_input.txt"):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def write(self, posts):
+        """Append a page of posts and flush them to disk before the cursor moves on"""
+        with self.lock:
+            with open(self.filename, 'a', encoding='utf-8') as f:
+                for post in posts:
+                    f.write(post + "\n\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.count += len(posts)
+
+def fetch_page(blog_domain, start_index, session, limiter=None, updated_min=None):
+    """Fetch one page of the Blogspot JSON feed, optionally only posts updated since updated_min"""
+    url = FEED_URL.format(blog=blog_domain)
+    params = {"alt": "json", "max-results": MAX_RESULTS, "start-index": start_index}
+    if updated_min:
+        # The feed ignores updated-min unless it is ordered by update time
+        params["orderby"] = "updated"
+        params["updated-min"] = updated_min
+    resp = get_with_retries(session, url, limiter, retries=3, params=params, timeout=10)
+    resp.raise_for_status()
+    return resp.json().get("feed", {}).get("entry", [])
 
 def extract_text(html_content):
     """
     Strip HTML tags and return plain text.
+    Streams through html.parser instead of building a BeautifulSoup tree per post;
+    scripts/benchmark_html_extraction.py compares the two.
     """
-    soup = BeautifulSoup(html_content, "html.parser")
-    return soup.get_text(separator=" ", strip=True)
-
-def scrape_blog(blog, scraped_blogs):
-    if blog in scraped_blogs:
-        print(f"⏭️  Skipping {blog} (already scraped)")
-        return []
-    print(f"Processing {blog}...")
+    return html_to_text(html_content)
+
+def extract_batch(html_batch):
+    """Extract the text of a batch of posts in order; runs in the extraction process pool"""
+    return [extract_text(html) if html else "" for html in html_batch]
+
+def submit_extraction(entries, extract_pool=None):
+    """
+    Start extracting the text of a page of feed entries. Returns a function that
+    waits for the texts, in entry order. Without a pool the page is extracted inline.
+    """
+    htmls = [entry_html(entry) for entry in entries]
+    if extract_pool is None:
+        return lambda: extract_batch(htmls)
+    futures = [extract_pool.submit(extract_batch, htmls[i:i + EXTRACT_BATCH_SIZE])
+               for i in range(0, len(htmls), EXTRACT_BATCH_SIZE)]
+    return lambda: list(chain.from_iterable(future.result() for future in futures))
+
+def entry_html(entry):
+    return entry.get("content", {}).get("$t") or entry.get("summary", {}).get("$t", "")
+
+def entry_post(entry, text):
+    """(post_id, updated, text) of a feed entry; posts without an id are identified by their text"""
+    post_id = entry.get("id", {}).get("$t") or content_hash(text)
+    updated = entry.get("updated", {}).get("$t")
+    return post_id, to_utc(updated) if updated else None, text
+
+def scrape_blog(blog, session, limiter, state, writer, index, seed=False, extract_pool=None):
+    """
+    Page through a blog's feed from its checkpointed cursor, asking only for posts
+    updated since the last crawl. Posts not in the index are written to disk before
+    the cursor advances; with seed=True they are only indexed.
+    Each page is extracted in extract_pool while the next one downloads.
+    Returns the number of posts written.
+    """
+    start_index = state.cursor(blog)
+    # The watermark only moves once the blog is finished, so a resumed crawl pages the same feed
+    updated_min = index.last_updated(blog)
+    if start_index > 1:
+        print(f"↪️  Resuming {blog} at post {start_index}")
+    elif seed:
+        print(f"Indexing previously scraped {blog} without writing its posts...")
+    elif updated_min:
+        print(f"Processing {blog} (posts updated since {updated_min})...")
+    else:
+        print(f"Processing {blog}...")
+
+    def commit_page(page_start, entries, texts):
+        """Index and write an extracted page, then move the cursor past it"""
+        posts = [entry_post(entry, text) for entry, text in zip(entries, texts) if text.strip()]
+        # New posts are on disk before the index marks them as known
+        new_posts = index.add_posts(blog, posts, before_commit=None if seed else writer.write)
+        print(f"  {blog}: posts {page_start}-{page_start + len(entries) - 1} "
+              f"({len(posts)} extracted, {len(new_posts)} new)")
+        state.advance(blog, page_start + MAX_RESULTS)
+        return 0 if seed else len(new_posts)
+
+    written = 0
+    extracting = None  # (start_index, entries, wait for texts) of the page in the extraction pool
+    while True:
+        entries = fetch_page(blog, start_index, session, limiter, updated_min)
+        if extracting:
+            page_start, page_entries, texts = extracting
+            written += commit_page(page_start, page_entries, texts())
+            extracting = None
+        if not entries:
+            break  # No more posts
+        extracting = (start_index, entries, submit_extraction(entries, extract_pool))
+
+        # Fewer posts than requested means we reached the end
+        if len(entries) < MAX_RESULTS:
+            break
+        start_index += MAX_RESULTS
+
+    if extracting:
+        page_start, page_entries, texts = extracting
+        written += commit_page(page_start, page_entries, texts())
+
+    index.finish_blog(blog)
+    if blog not in load_scraped_blogs():
+        save_scraped_blog(blog)
+    state.finish(blog)
+    return written
+
+def crawl(blog_domains, output="text_input.txt", workers=8, rps_per_host=1.0, state_file=STATE_FILE,
+          index_file=INDEX_FILE, seed_blogs=(), extract_workers=None):
+    """
+    Crawl several blogs concurrently. Requests to the same host share one rate
+    limiter; a run that left unfinished cursors behind is resumed. New posts are
+    appended to output.
+    Blogs in seed_blogs are indexed without writing their posts.
+    HTML is converted to text in a pool of extract_workers processes
+    (default: one per CPU, 0 extracts in the crawler threads).
+    """
+    state = CrawlState(state_file)
+    index = PostIndex(index_file)
+    if state.cursors:
+        print(f"Resuming interrupted crawl of {len(state.cursors)} blogs")
+    state.start(blog_domains)
+
+    limiters = {}
+    for blog in blog_domains:
+        host = urlsplit(f"https://{blog}").hostname
+        limiters.setdefault(host, TokenBucket(rps_per_host, burst=1))
+
+    session = make_session(pool_size=workers)
+    writer = PostWriter(output)
+    extract_pool = None
+    if extract_workers != 0:
+        # Workers start on the first submit, inside a crawler thread; forking a multi-threaded
+        # process can deadlock the child, so they are started by a fork server (or spawned) instead
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        extract_pool = ProcessPoolExecutor(max_workers=extract_workers,
+                                           mp_context=multiprocessing.get_context(start_method))
     try:
-        entries = fetch_posts(blog)
-        print(f"Found {len(entries)} posts from {blog}")
-        blog_posts = []
-        for entry in entries:
-            raw_html = entry.get("content", {}).get("$t") or entry.get("summary", {}).get("$t", "")
-            if raw_html:
-                text = extract_text(raw_html)
-                if text.strip():
-                    blog_posts.append(text)
-        if blog_posts:
-            save_scraped_blog(blog)
-            print(f"✅ Successfully scraped {len(blog_posts)} posts from {blog}")
-        else:
-            print(f"⚠️  No posts extracted from {blog}")
-        return blog_posts
-    except Exception as e:
-        print(f"❌ Error processing {blog}: {e}")
-        return []
-
-def save_posts(posts, filename="text_input.txt"):
-    if posts:
-        with open(filename, "w", encoding="utf-8") as f:
-            for post in posts:
-                f.write(post + "\n\n")
-        print(f"✅ Successfully saved {len(posts)} posts to {filename}")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(scrape_blog, blog, session, limiters[urlsplit(f"https://{blog}").hostname],
+                                state, writer, index, blog in seed_blogs, extract_pool): blog
+                for blog in blog_domains
+            }
+            for future in as_completed(futures):
+                blog = futures[future]
+                try:
+                    print(f"✅ Successfully scraped {future.result()} posts from {blog}")
+                except Exception as e:
+                    print(f"❌ Error processing {blog}: {e} (will resume from its checkpoint next run)")
+    finally:
+        if extract_pool:
+            extract_pool.shutdown()
+        session.close()
+        index.close()
+
+    if writer.count:
+        print(f"✅ Successfully saved {writer.count} posts to {output}")
     else:
         print("❌ No new posts were extracted")
 
 def main():
+    parser = argparse.ArgumentParser(description='Scrape Blogspot blogs into a text file for frequency analysis')
+    parser.add_argument('--output', default='text_input.txt', help='Path to output .txt file (default: text_input.txt)')
+    parser.add_argument('--workers', type=int, default=8, help='Blogs crawled at once (default: 8)')
+    parser.add_argument('--rps-per-host', type=float, default=1.0, help='Maximum feed requests per second to one host (default: 1)')
+    parser.add_argument('--state', default=STATE_FILE, help=f'Path to the crawl checkpoint file (default: {STATE_FILE})')
+    parser.add_argument('--extract-workers', type=int, default=None, help='Processes converting HTML to text (default: one per CPU, 0 to extract in the crawler threads)')
+    parser.add_argument('--index', default=INDEX_FILE, help=f'Path to the scraped post index (default: {INDEX_FILE})')
+    args = parser.parse_args()
+
+    # Every blog is crawled incrementally. Blogs scraped before the post index existed
+    # are indexed once without output, since their posts are already in the dataset.
     scraped_blogs = load_scraped_blogs()
-    all_posts = []
-    for blog in blogs:
-        blog_posts = scrape_blog(blog, scraped_blogs)
-        all_posts.extend(blog_posts)
-    save_posts(all_posts)
+    index = PostIndex(args.index)
+    seed_blogs = {blog for blog in blogs if blog in scraped_blogs and not index.has_blog(blog)}
+    index.close()
+    crawl(blogs, args.output, args.workers, args.rps_per_host, args.state, args.index, seed_blogs,
+          args.extract_workers)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Incremental Anki deck builds.
+
+The collection of the last build is kept next to a SQLite table with a
+content hash per note (fields, model id, guid and sub-deck). The next
+build starts from that collection, keeps every note whose hash is still
+wanted and only removes or inserts the rest, so its cost follows the
+size of the change instead of the size of the deck.
+"""
+
+import os
+import sqlite3
+import hashlib
+
+from apkg_writer import ApkgWriter
+
+RECORD_BATCH_SIZE = 5000
+
+
+def note_hash(deck, model, fields, guid):
+    """Content hash of a note as it ends up in the collection"""
+    # \x1f separates fields in the collection itself, so it cannot occur inside one
+    content = '\x1f'.join((str(model.model_id), str(guid), str(deck.deck_id), deck.name, *fields))
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class DeckBuildCache:
+    """
+    Note hashes of the last build, by note id, plus the collection it produced
+    (the cache path with an .anki2 extension).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.collection_path = os.path.splitext(path)[0] + '.anki2'
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS notes (note_id INTEGER PRIMARY KEY, guid TEXT NOT NULL, note_hash TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS notes_by_hash ON notes (note_hash);
+            CREATE INDEX IF NOT EXISTS notes_by_guid ON notes (guid);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+
+            -- Notes of the last build not claimed by the current one yet, and the current build
+            CREATE TEMP TABLE unclaimed (note_id INTEGER PRIMARY KEY, guid TEXT NOT NULL, note_hash TEXT NOT NULL);
+            INSERT INTO unclaimed SELECT * FROM notes;
+            CREATE INDEX temp.unclaimed_by_hash ON unclaimed (note_hash);
+            CREATE TEMP TABLE build_notes (note_id INTEGER PRIMARY KEY, guid TEXT NOT NULL, note_hash TEXT NOT NULL);
+            CREATE INDEX temp.build_notes_by_guid ON build_notes (guid);
+        """)
+        self.pending = []
+
+    def base_collection(self):
+        """The kept collection, or None if it is missing or does not belong to the stored hashes"""
+        if not os.path.exists(self.collection_path):
+            return None
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'collection'").fetchone()
+        if not row or row[0] != file_signature(self.collection_path):
+            return None
+        return self.collection_path
+
+    def claim(self, digest):
+        """Id of a note of the last build with this hash that no other note claimed yet, or None"""
+        row = self.conn.execute("SELECT note_id FROM unclaimed WHERE note_hash = ? LIMIT 1", (digest,)).fetchone()
+        if row:
+            self.conn.execute("DELETE FROM unclaimed WHERE note_id = ?", row)
+            return row[0]
+        return None
+
+    def had_guid(self, guid):
+        return self.conn.execute("SELECT 1 FROM notes WHERE guid = ?", (str(guid),)).fetchone() is not None
+
+    def record(self, note_id, guid, digest):
+        """Remember a note of the current build"""
+        self.pending.append((note_id, str(guid), digest))
+        if len(self.pending) >= RECORD_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        self.conn.executemany("INSERT INTO build_notes VALUES (?, ?, ?)", self.pending)
+        self.pending.clear()
+
+    def unclaimed_notes(self):
+        """(note_id, guid still in use) for every note of the last build the current one did not keep"""
+        self._flush()
+        for note_id, in_use in self.conn.execute(
+                "SELECT note_id, EXISTS (SELECT 1 FROM build_notes b WHERE b.guid = u.guid) FROM unclaimed u"):
+            yield note_id, bool(in_use)
+
+    def commit(self):
+        """Make the current build the base of the next one; call after its collection was kept"""
+        self._flush()
+        with self.conn:
+            self.conn.execute("DELETE FROM notes")
+            self.conn.execute("INSERT INTO notes SELECT * FROM build_notes")
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('collection', ?)",
+                              (file_signature(self.collection_path),))
+
+    def close(self):
+        self.conn.close()
+
+
+class IncrementalDeckBuild:
+    """
+    Writes a .apkg like ApkgWriter, reusing the collection of the previous build for
+    every note that did not change. Register every sub-deck with add_deck() and
+    every note with add_note(), even unchanged ones, then call write().
+    """
+
+    def __init__(self, output_file, cache_path, full_rebuild=False):
+        self.cache = DeckBuildCache(cache_path)
+        self.base = None if full_rebuild else self.cache.base_collection()
+        self.writer = ApkgWriter(output_file, base_collection=self.base)
+        self.report = {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 0}
+
+    def add_deck(self, deck):
+        self.writer.add_deck(deck)
+
+    def add_note(self, deck, model, fields, guid):
+        digest = note_hash(deck, model, fields, guid)
+        kept_id = self.cache.claim(digest)
+        if kept_id is not None:
+            self.report['unchanged'] += 1
+            # A full build writes every note, an incremental one keeps the unchanged rows
+            if self.base:
+                self.cache.record(kept_id, guid, digest)
+                return
+        elif self.cache.had_guid(guid):
+            self.report['changed'] += 1
+        else:
+            self.report['added'] += 1
+        note_id = self.writer.add_note(deck.deck_id, model, fields, guid=guid)
+        self.cache.record(note_id, guid, digest)
+
+    def write(self):
+        """Write the .apkg, keep its collection for the next build and return the change report"""
+        for note_id, in_use in self.cache.unclaimed_notes():
+            # Old versions of changed notes are replaced, not removed
+            self.report['removed'] += not in_use
+            if self.base:
+                self.writer.remove_notes((note_id,))
+        self.writer.write(keep_collection=self.cache.collection_path)
+        self.cache.commit()
+        return self.report
+
+    def summary(self):
+        mode = "Incremental build" if self.base else "Full build"
+        return (f"{mode}: {self.report['added']} added, {self.report['changed']} changed, "
+                f"{self.report['removed']} removed, {self.report['unchanged']} unchanged notes")
+
+    def close(self):
+        self.writer.close()
+        self.cache.close()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Parallel export of independent .apkg files (one per batch, level or deck
+variant) in a process pool.
+
+The source data is handed to every worker process once, when the pool
+starts, and is only read from there on; each job only carries the small
+arguments that select its part of the data.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+_shared = None
+
+
+def _init_worker(shared):
+    global _shared
+    _shared = shared
+
+
+def _run_job(build_deck, job):
+    return build_deck(_shared, *job)
+
+
+def export_decks(build_deck, jobs, shared, workers=None):
+    """
+    Call build_deck(shared, *job) for every job in a pool of `workers` processes
+    (default: one per CPU) and yield (job, result) as the decks finish.
+    build_deck must be a module-level function so it can be sent to the workers.
+    """
+    jobs = list(jobs)
+    workers = min(workers or os.cpu_count() or 1, len(jobs) or 1)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared,)) as executor:
+        futures = {executor.submit(_run_job, build_deck, job): job for job in jobs}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Persistent Tatoeba example cache backed by SQLite.
+
+Examples are keyed by the normalised Finnish word instead of its rank, so
+words moving up or down the top list keep their examples and only words
+that were never fetched before cost a network call. Each entry records
+when it was fetched and how many examples were asked for.
+"""
+
+import sqlite3
+from datetime import datetime
+
+CACHE_FILE = "example_cache.sqlite"
+
+# Definitive "nothing there" answers are cached, transient errors are retried
+CACHEABLE_PLACEHOLDERS = ("[No examples found]", "[No translated examples found]")
+
+
+def normalize_word(finnish_word):
+    """Cache key for a word or phrase: lowercase with single spaces"""
+    return ' '.join(finnish_word.lower().split())
+
+
+def is_cacheable(examples):
+    return bool(examples.strip()) and (not examples.startswith("[") or examples in CACHEABLE_PLACEHOLDERS)
+
+
+class ExampleCache:
+    def __init__(self, path=CACHE_FILE):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS examples (
+                finnish TEXT PRIMARY KEY,
+                examples TEXT NOT NULL,
+                fetched_at TEXT NOT NULL,
+                max_examples INTEGER
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, finnish_word, max_examples=None):
+        """
+        Return cached examples for a word, or None if it has to be fetched.
+        Entries fetched with a smaller max_examples than requested count as missing.
+        """
+        row = self.conn.execute(
+            "SELECT examples, max_examples FROM examples WHERE finnish = ?", (normalize_word(finnish_word),)
+        ).fetchone()
+        if row is None:
+            return None
+        examples, cached_max = row
+        if max_examples is not None and cached_max is not None and cached_max < max_examples:
+            return None
+        return examples
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM examples").fetchone()[0]
+
+    def put(self, finnish_word, examples, max_examples):
+        """Store freshly fetched examples and commit immediately; errors are not stored"""
+        if not is_cacheable(examples):
+            return False
+        self.conn.execute(
+            "INSERT OR REPLACE INTO examples (finnish, examples, fetched_at, max_examples) VALUES (?, ?, ?, ?)",
+            (normalize_word(finnish_word), examples, datetime.now().isoformat(timespec='seconds'), max_examples)
+        )
+        self.conn.commit()
+        return True
+
+    def import_rows(self, rows):
+        """
+        Add (finnish, examples) pairs from an existing examples CSV that are not
+        cached yet. Their max_examples is unknown, so they are never refetched for it.
+        Returns the number of imported words.
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        before = self.conn.total_changes
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO examples (finnish, examples, fetched_at, max_examples) VALUES (?, ?, ?, NULL)",
+            [(normalize_word(finnish), examples, now) for finnish, examples in rows
+             if examples.strip() and not examples.startswith("[")]
+        )
+        self.conn.commit()
+        return self.conn.total_changes - before
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Lightweight HTML to plain text extraction for scraped blog posts.
+
+Streams the markup through the standard library's HTMLParser and keeps
+only the text nodes, without building a document tree. The content of
+script and style elements and comments is skipped, and every text node
+is stripped and joined with a separator, like BeautifulSoup's
+get_text(separator=" ", strip=True).
+"""
+
+from html.parser import HTMLParser
+
+SKIPPED_TAGS = frozenset(('script', 'style'))
+
+
+class TextExtractor(HTMLParser):
+    """Incremental extractor: feed() markup in any pieces, then call text()"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.parts.append(data)
+
+    def text(self, separator=" "):
+        self.close()
+        return separator.join(part for part in map(str.strip, self.parts) if part)
+
+
+def html_to_text(html_content, separator=" "):
+    """Strip HTML tags and return plain text"""
+    extractor = TextExtractor()
+    extractor.feed(html_content)
+    return extractor.text(separator)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP helpers for the scripts that call web APIs:
+a pooled requests session, a token-bucket rate limiter and GET with
+exponential backoff and jitter.
+"""
+
+import time
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+
+class TokenBucket:
+    """Thread-safe rate limiter allowing `rate` requests per second with bursts up to `burst`"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def make_session(pool_size=10, user_agent=USER_AGENT):
+    """Create a session whose connection pool fits pool_size concurrent requests"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = user_agent
+    return session
+
+
+def backoff_delay(attempt, base=1.0, cap=30.0):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def get_with_retries(session, url, limiter=None, retries=3, backoff=1.0, **kwargs):
+    """
+    GET a URL, retrying connection errors, 429 and 5xx responses with backoff.
+    Honors Retry-After when the server sends one. Returns the last response,
+    or raises the last connection error.
+    """
+    for attempt in range(retries + 1):
+        if limiter:
+            limiter.acquire()
+        try:
+            response = session.get(url, **kwargs)
+        except requests.RequestException:
+            if attempt == retries:
+                raise
+            time.sleep(backoff_delay(attempt, backoff))
+            continue
+
+        if response.status_code not in RETRY_STATUSES or attempt == retries:
+            return response
+
+        retry_after = response.headers.get('Retry-After', '')
+        delay = float(retry_after) if retry_after.isdigit() else backoff_delay(attempt, backoff)
+        time.sleep(delay)
+    return response
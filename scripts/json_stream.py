@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Incremental reading of large JSON objects.
+
+iter_object_items() walks the members of a top-level JSON object
+({"word": {...}, ...}) a chunk at a time and yields them one by one, so
+only a single member is in memory instead of the whole file. Only the
+standard library's json decoder is used.
+"""
+
+import re
+import json
+import codecs
+
+CHUNK_SIZE = 1 << 16  # Bytes read from the file at a time
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+VALUE_END = ' \t\n\r,:}]'  # What may follow a complete value or key
+
+_decoder = json.JSONDecoder()
+
+
+class _Buffer:
+    """Decoded text of the file around the read position"""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Read the next chunk; returns False at the end of the file"""
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        self.eof = not chunk
+        # Drop the consumed text, so the buffer only ever holds about one chunk plus one member
+        self.text = self.text[self.pos:] + self.utf8.decode(chunk, final=self.eof)
+        self.pos = 0
+        return not self.eof
+
+    def skip_whitespace(self):
+        while True:
+            self.pos = WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text) or not self.fill():
+                return
+
+    def expect(self, chars):
+        self.skip_whitespace()
+        if self.pos >= len(self.text) or self.text[self.pos] not in chars:
+            raise json.JSONDecodeError(f"Expecting one of {chars!r}", self.text, self.pos)
+        char = self.text[self.pos]
+        self.pos += 1
+        return char
+
+    def decode(self):
+        """Decode the JSON value at the read position, reading more of the file until it is complete"""
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+                # A number cut off by the end of the buffer may continue in the next chunk
+                if self.eof or (end < len(self.text) and self.text[end] in VALUE_END):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+
+
+def iter_object_items(f, chunk_size=CHUNK_SIZE):
+    """Yield (key, value) for every member of the JSON object in the binary file f"""
+    if f.read(len(codecs.BOM_UTF8)) != codecs.BOM_UTF8:
+        f.seek(0)
+    buf = _Buffer(f, chunk_size)
+    buf.expect('{')
+    buf.skip_whitespace()
+    if buf.text.startswith('}', buf.pos):
+        return
+    while True:
+        key = buf.decode()
+        if not isinstance(key, str):
+            raise json.JSONDecodeError("Expecting property name", buf.text, buf.pos)
+        buf.expect(':')
+        yield key, buf.decode()
+        if buf.expect(',}') == '}':
+            return
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+N-gram counting engine shared by the frequency scripts.
+
+The text is tokenized once, every token is mapped to an integer id and
+1- to max_n-grams are counted in one pass over the id list.  N-grams are
+keyed by tuples of token ids, so no joined phrase strings are built until
+the final top list is written.
+
+Text can be fed in chunks: a word cut at the end of a chunk is held back
+until the next one, and the last max_n-1 token ids are carried over so
+n-grams crossing a chunk boundary are still counted exactly once.
+
+With several workers the file is split into byte-range shards that start
+and end on whitespace.  Each shard is counted in its own process, and the
+n-grams that cross shard boundaries are stitched back in while the partial
+counts are merged in file order.
+
+The counts can be kept in an on-disk index together with a watermark of
+how many bytes of the file they cover.  As long as the file is only
+appended to, the next run counts just the new tail and adds it to the
+stored counts.
+
+For corpora where exact 2- to 4-gram counts do not fit in memory, a
+counter can be given a capacity.  Each of those orders is then kept as a
+Misra-Gries summary: whenever more than `capacity` n-grams are tracked,
+the (capacity+1)-th largest count is subtracted from all of them and the
+ones that drop to zero are forgotten.  Every kept count is at most
+`errors[n]` below the true one, and errors[n] <= totals[n] / (capacity+1).
+1-grams are always counted exactly since the vocabulary is kept anyway.
+"""
+
+import os
+import re
+import codecs
+import pickle
+import math
+import heapq
+import hashlib
+from collections import Counter
+from itertools import islice
+from operator import itemgetter
+from multiprocessing import Pool
+
+TOKEN_PATTERN = re.compile(r'\b\w+\b')
+CHUNK_SIZE = 1 << 20  # characters read per chunk when streaming a file
+INDEX_VERSION = 2
+FINGERPRINT_SIZE = 1 << 16  # bytes before the watermark that must be unchanged to resume
+TIE_BREAKS = ('first-seen', 'alphabetical')
+
+
+def tokenize(text):
+    """Extract lowercase words from text"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class NgramCounter:
+    """Counts 1- to max_n-grams keyed by token-id tuples (plain ids for 1-grams)"""
+
+    def __init__(self, max_n=4, capacity=None):
+        self.max_n = max_n
+        self.capacity = capacity  # n-grams kept per order above 1, None for exact counts
+        self.ids = {}  # token -> id
+        self.counts = {n: Counter() for n in range(1, max_n + 1)}
+        self.totals = {n: 0 for n in range(1, max_n + 1)}  # n-grams seen per order
+        self.errors = {n: 0 for n in range(1, max_n + 1)}  # max undercount per order
+        self.head = []  # first max_n-1 token ids seen
+        self.tail = []  # last max_n-1 token ids seen
+        self.pending = ''  # word cut at the end of the last chunk
+
+    def add_tokens(self, tokens):
+        """Map tokens to ids and count every n-gram in a single sliding window"""
+        ids = self.ids
+        add_id = ids.setdefault
+        seq = [add_id(token, len(ids)) for token in tokens]
+        if not seq:
+            return
+
+        # Prefix the carried tail so windows that start before this batch are counted;
+        # every window still contains at least one new token, so nothing is counted twice
+        window = self.tail + seq
+        carried = len(self.tail)
+
+        self.counts[1].update(seq)
+        self.totals[1] += len(seq)
+        for n in range(2, self.max_n + 1):
+            start = max(0, carried - (n - 1))
+            # zip over offset views of the same list: one window per position, no copies
+            self.counts[n].update(zip(*(islice(window, start + i, None) for i in range(n))))
+            self.totals[n] += max(0, len(window) - start - n + 1)
+        self.prune()
+
+        if len(self.head) < self.max_n - 1:
+            self.head = (self.head + seq)[:self.max_n - 1]
+        self.tail = window[-(self.max_n - 1):] if self.max_n > 1 else []
+
+    def add_text(self, text):
+        self.add_tokens(tokenize(text))
+
+    def feed(self, chunk):
+        """Count a chunk of a longer text, holding back a word cut at its end"""
+        text = self.pending + chunk.lower()
+        tokens = TOKEN_PATTERN.findall(text)
+        last = text[-1:]
+        if tokens and (last.isalnum() or last == '_'):
+            # The text ends inside a word: the last token may continue in the next chunk
+            self.pending = tokens.pop()
+        else:
+            self.pending = ''
+        self.add_tokens(tokens)
+
+    def prune(self):
+        """Shrink the 2- to max_n-gram counts back to capacity (Misra-Gries)"""
+        if not self.capacity:
+            return
+        for n in range(2, self.max_n + 1):
+            counts = self.counts[n]
+            if len(counts) <= self.capacity:
+                continue
+            cut = sorted(counts.values(), reverse=True)[self.capacity]
+            self.counts[n] = Counter({key: count - cut for key, count in counts.items() if count > cut})
+            self.errors[n] += cut
+
+    def finish(self):
+        """Count the held-back word once the text has ended"""
+        if self.pending:
+            self.add_tokens([self.pending])
+            self.pending = ''
+
+    def merge(self, other):
+        """
+        Add the counts of a counter that covered the text directly after this one.
+        The n-grams spanning the boundary between the two are counted here.
+        """
+        # The other text starts on a token boundary, so a held-back word is complete
+        self.finish()
+
+        ids = self.ids
+        add_id = ids.setdefault
+        remap = [None] * len(other.ids)
+        for token, token_id in other.ids.items():
+            remap[token_id] = add_id(token, len(ids))
+
+        head = [remap[i] for i in other.head]
+        tail = [remap[i] for i in other.tail]
+
+        # Windows that start in our tail and end in the other counter's head
+        window = self.tail + head
+        carried = len(self.tail)
+        for n in range(2, self.max_n + 1):
+            for start in range(max(0, carried - (n - 1)), carried):
+                if start + n <= len(window):
+                    self.counts[n][tuple(window[start:start + n])] += 1
+                    self.totals[n] += 1
+
+        counts = self.counts[1]
+        for key, count in other.counts[1].items():
+            counts[remap[key]] += count
+        for n in range(2, self.max_n + 1):
+            counts = self.counts[n]
+            for key, count in other.counts[n].items():
+                counts[tuple([remap[i] for i in key])] += count
+
+        for n in range(1, self.max_n + 1):
+            self.totals[n] += other.totals[n]
+            self.errors[n] += other.errors[n]
+        self.prune()
+
+        if len(self.head) < self.max_n - 1:
+            self.head = (self.head + head)[:self.max_n - 1]
+        if self.max_n > 1:
+            self.tail = (self.tail + tail)[-(self.max_n - 1):]
+        self.pending = other.pending
+
+    def vocab(self):
+        """Return the id -> token list"""
+        vocab = [None] * len(self.ids)
+        for token, token_id in self.ids.items():
+            vocab[token_id] = token
+        return vocab
+
+
+def shard_offsets(file_path, shards):
+    """Split a file into byte ranges whose boundaries fall on whitespace"""
+    size = os.path.getsize(file_path)
+    offsets = [0]
+    with open(file_path, 'rb') as file:
+        for i in range(1, shards):
+            position = max(size * i // shards, offsets[-1])
+            file.seek(position)
+            # Walk forward to the next whitespace byte (always a character boundary in UTF-8)
+            while True:
+                block = file.read(4096)
+                if not block:
+                    position = size
+                    break
+                match = re.search(rb'\s', block)
+                if match:
+                    position += match.start()
+                    break
+                position += len(block)
+            if position >= size:
+                break
+            if position > offsets[-1]:
+                offsets.append(position)
+    offsets.append(size)
+    return list(zip(offsets, offsets[1:]))
+
+
+def feed_range(counter, file_path, start, end, chunk_size=CHUNK_SIZE):
+    """Feed the bytes [start, end) of a UTF-8 file to a counter in chunks"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = file.read(min(chunk_size, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            counter.feed(decoder.decode(block))
+        counter.feed(decoder.decode(b'', final=True))
+
+
+def capacity_for(epsilon=None, max_counters=None):
+    """Counters needed per order for a max undercount of epsilon * total, capped at max_counters"""
+    capacities = [c for c in (math.ceil(1 / epsilon) if epsilon else None, max_counters) if c]
+    return min(capacities) if capacities else None
+
+
+def count_shard(task):
+    """Count one byte range of a file (runs in a worker process)"""
+    file_path, start, end, max_n, chunk_size, capacity = task
+    counter = NgramCounter(max_n, capacity)
+    feed_range(counter, file_path, start, end, chunk_size)
+    return counter
+
+
+def count_file(file_path, max_n=4, chunk_size=CHUNK_SIZE, workers=1, finish=True, capacity=None):
+    """
+    Stream a text file through a new counter in fixed-size chunks.
+    With finish=False a word at the very end of the file is left pending,
+    so more text appended later can still be fed to the counter.
+    """
+    if workers > 1:
+        tasks = [(file_path, start, end, max_n, chunk_size, capacity)
+                 for start, end in shard_offsets(file_path, workers)]
+        counter = None
+        with Pool(min(workers, len(tasks))) as pool:
+            # imap keeps file order, so shards are merged as soon as their predecessors are
+            for shard in pool.imap(count_shard, tasks):
+                if counter is None:
+                    counter = shard
+                else:
+                    counter.merge(shard)
+        if finish:
+            counter.finish()
+        return counter
+
+    counter = NgramCounter(max_n, capacity)
+    with open(file_path, 'r', encoding='utf-8') as file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            counter.feed(chunk)
+    if finish:
+        counter.finish()
+    return counter
+
+
+def file_fingerprint(file_path, watermark):
+    """Hash of the bytes just before the watermark, used to detect a rewritten file"""
+    with open(file_path, 'rb') as file:
+        file.seek(max(0, watermark - FINGERPRINT_SIZE))
+        return hashlib.sha1(file.read(min(watermark, FINGERPRINT_SIZE))).hexdigest()
+
+
+def load_index(index_path, file_path, max_n, capacity=None):
+    """
+    Load stored counts if they still describe the beginning of the file.
+    Returns (counter, watermark), or (None, 0) when the file must be recounted.
+    """
+    try:
+        with open(index_path, 'rb') as f:
+            index = pickle.load(f)
+    except FileNotFoundError:
+        return None, 0
+    except Exception as e:
+        print(f"Warning: Could not read n-gram index '{index_path}': {e}")
+        return None, 0
+
+    watermark = index.get('watermark', 0)
+    if (index.get('version') != INDEX_VERSION
+            or index.get('max_n') != max_n
+            or index.get('capacity') != capacity
+            or os.path.getsize(file_path) < watermark
+            or index.get('fingerprint') != file_fingerprint(file_path, watermark)):
+        print(f"[INFO] '{file_path}' no longer matches the n-gram index, recounting from scratch")
+        return None, 0
+    return index['counter'], watermark
+
+
+def save_index(index_path, counter, file_path, watermark):
+    """Write the counts and watermark, replacing the old index only once fully written"""
+    index = {
+        'version': INDEX_VERSION,
+        'max_n': counter.max_n,
+        'capacity': counter.capacity,
+        'watermark': watermark,
+        'fingerprint': file_fingerprint(file_path, watermark),
+        'counter': counter,
+    }
+    temp_path = index_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, index_path)
+
+
+def count_file_incremental(file_path, index_path, max_n=4, chunk_size=CHUNK_SIZE, workers=1,
+                           rebuild=False, capacity=None):
+    """Count only the part of the file appended since the index was last saved"""
+    counter, watermark = (None, 0) if rebuild else load_index(index_path, file_path, max_n, capacity)
+    size = os.path.getsize(file_path)
+
+    if counter is None:
+        counter = count_file(file_path, max_n, chunk_size, workers, finish=False, capacity=capacity)
+        print(f"[OK] Counted all {size} bytes of '{file_path}'")
+    else:
+        feed_range(counter, file_path, watermark, size, chunk_size)
+        print(f"[OK] Counted {size - watermark} new bytes of '{file_path}' (index covered {watermark})")
+
+    # Saved before finish() so a word at the end of the file can still grow on the next run
+    save_index(index_path, counter, file_path, size)
+    counter.finish()
+    return counter
+
+
+def decode(key, vocab):
+    """Turn a counter key back into its phrase"""
+    if isinstance(key, int):
+        return vocab[key]
+    return ' '.join(vocab[i] for i in key)
+
+
+def blacklist_keys(counter, blacklist):
+    """Translate blacklisted phrases into counter keys, per n-gram order"""
+    keys = {n: set() for n in range(1, counter.max_n + 1)}
+    for phrase in blacklist or ():
+        parts = phrase.split(' ')
+        # Phrases containing an unseen word can never match an n-gram
+        if len(parts) > counter.max_n or not all(part in counter.ids for part in parts):
+            continue
+        ids = [counter.ids[part] for part in parts]
+        keys[len(ids)].add(ids[0] if len(ids) == 1 else tuple(ids))
+    return keys
+
+
+def select_top_ngrams(counter, limit=1000, min_frequency=1, blacklist=None, tie_break='first-seen'):
+    """
+    Return the most frequent (phrase, count) pairs over all n-gram orders.
+
+    Entries below min_frequency or on the blacklist are skipped per order while
+    streaming over the counters, and a heap keeps only the best `limit` of them.
+    Equal counts are ordered by tie_break:
+      'first-seen'   - lower n first, then first occurrence in the text
+                       (the order of the original script)
+      'alphabetical' - lower n first, then by phrase
+    """
+    if tie_break not in TIE_BREAKS:
+        raise ValueError(f"Unknown tie-break rule '{tie_break}', expected one of {TIE_BREAKS}")
+
+    banned = blacklist_keys(counter, blacklist)
+
+    def candidates(threshold):
+        for n in range(1, counter.max_n + 1):
+            banned_keys = banned[n]
+            for key, count in counter.counts[n].items():
+                if count >= threshold and key not in banned_keys:
+                    yield count, n, key
+
+    # nlargest is stable, so equal counts keep their streaming order
+    top = heapq.nlargest(limit, candidates(min_frequency), key=itemgetter(0))
+
+    vocab = counter.vocab()
+    if tie_break == 'alphabetical' and top:
+        # Re-collect everything tied with the last entry before ordering by phrase
+        cutoff = top[-1][0] if len(top) >= limit else min_frequency
+        tied = [(count, n, decode(key, vocab)) for count, n, key in candidates(max(cutoff, min_frequency))]
+        tied.sort(key=lambda x: (-x[0], x[1], x[2]))
+        return [(phrase, count) for count, _, phrase in tied[:limit]]
+
+    return [(decode(key, vocab), count) for count, _, key in top]
+
+
+def approximation_report(counter, top_ngrams, limit=1000, exact_top=None):
+    """
+    Describe how far the top list of an approximate counter can be from the exact one.
+    Pass the exact top list as exact_top to also compare against real counts.
+    """
+    lines = []
+    for n in range(2, counter.max_n + 1):
+        total = counter.totals[n]
+        error = counter.errors[n]
+        share = error / total * 100 if total else 0
+        lines.append(f"{n}-grams: {len(counter.counts[n])} tracked of {total} seen, "
+                     f"counts at most {error} too low ({share:.4f}% of total)")
+
+    # An entry is certainly in the top list if even its lower bound beats
+    # the highest possible true count of anything left out
+    max_error = max(counter.errors.values())
+    outside_bound = (top_ngrams[-1][1] if len(top_ngrams) >= limit else 0) + max_error
+    certain = sum(1 for _, count in top_ngrams if count > outside_bound)
+    lines.append(f"{certain}/{len(top_ngrams)} entries are guaranteed to belong in the exact top list")
+
+    if exact_top is not None:
+        exact = dict(exact_top)
+        shared = [(phrase, count) for phrase, count in top_ngrams if phrase in exact]
+        lines.append(f"{len(shared)}/{len(exact_top)} entries match the exact top list")
+        if shared:
+            max_diff = max(exact[phrase] - count for phrase, count in shared)
+            lines.append(f"Largest count difference on shared entries: {max_diff}")
+    return lines
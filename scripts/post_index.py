@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Index of scraped blog posts backed by SQLite.
+
+Remembers every post id with a hash of its extracted text and the newest
+`updated` timestamp seen per blog. The scraper uses it to ask the feed only
+for posts changed since the last run and to keep duplicate posts, whether
+re-served by the feed or copied between blogs, out of text_input.txt.
+"""
+
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+INDEX_FILE = "scraped_posts.sqlite"
+
+
+def content_hash(text):
+    """Hash of a post's text, insensitive to whitespace differences"""
+    return hashlib.sha1(' '.join(text.split()).encode('utf-8')).hexdigest()
+
+
+def to_utc(timestamp):
+    """Normalise a feed timestamp like 2023-05-01T10:20:30.123+03:00 to UTC so they compare as strings"""
+    return datetime.fromisoformat(timestamp).astimezone(timezone.utc).isoformat(timespec='milliseconds')
+
+
+class PostIndex:
+    def __init__(self, path=INDEX_FILE):
+        # Shared by the crawler threads, so access is serialised with a lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS blogs (
+                domain TEXT PRIMARY KEY,
+                last_updated TEXT
+            );
+            CREATE TABLE IF NOT EXISTS posts (
+                post_id TEXT PRIMARY KEY,
+                blog TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                updated TEXT
+            );
+            CREATE INDEX IF NOT EXISTS posts_by_hash ON posts (content_hash);
+        """)
+        self.conn.commit()
+
+    def last_updated(self, blog_domain):
+        """Newest post timestamp seen on a blog (UTC), or None if it was never crawled with the index"""
+        with self.lock:
+            row = self.conn.execute("SELECT last_updated FROM blogs WHERE domain = ?", (blog_domain,)).fetchone()
+        return row[0] if row else None
+
+    def has_blog(self, blog_domain):
+        """Whether the blog was ever finished with the index, even if it had no posts"""
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM blogs WHERE domain = ?", (blog_domain,)).fetchone() is not None
+
+    def add_posts(self, blog_domain, posts, before_commit=None):
+        """
+        Record (post_id, updated, text) tuples and return the texts of the ones
+        not seen before. A post is a duplicate if its id is already known, or
+        if another post with the same text was already kept.
+        before_commit(new_texts) runs before the posts are committed, so a crash
+        while it writes them out leaves them unknown and they are fetched again.
+        """
+        new_texts = []
+        with self.lock, self.conn:
+            for post_id, updated, text in posts:
+                digest = content_hash(text)
+                known = self.conn.execute("SELECT 1 FROM posts WHERE post_id = ?", (post_id,)).fetchone()
+                duplicate = known or self.conn.execute(
+                    "SELECT 1 FROM posts WHERE content_hash = ?", (digest,)).fetchone()
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO posts (post_id, blog, content_hash, updated) VALUES (?, ?, ?, ?)",
+                    (post_id, blog_domain, digest, updated)
+                )
+                if not duplicate:
+                    new_texts.append(text)
+            if before_commit:
+                before_commit(new_texts)
+        return new_texts
+
+    def finish_blog(self, blog_domain):
+        """Move the blog's updated-min watermark to its newest indexed post"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO blogs (domain, last_updated) "
+                "VALUES (?, (SELECT MAX(updated) FROM posts WHERE blog = ?))", (blog_domain, blog_domain)
+            )
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
@@ -4,19 +4,27 @@ Tatoeba Sentence Examples Extractor for Finnish Words
 Gets example sentences with English translations from Tatoeba.org
 """
 
-import requests
 import csv
 import time
 import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Tuple, Dict
 
-def get_tatoeba_examples(finnish_word: str, max_examples: int = 10) -> str:
+from http_utils import TokenBucket, get_with_retries, make_session
+from example_cache import CACHE_FILE, ExampleCache
+from tatoeba_index import INDEX_FILE, TatoebaIndex
+
+TATOEBA_API_URL = "https://tatoeba.org/en/api_v0/search"
+USER_AGENT = 'Finnish-Learning-Tool/1.0 (educational use)'
+
+def get_tatoeba_examples(finnish_word: str, max_examples: int = 10, session=None,
+                         limiter: TokenBucket = None, api_url: str = TATOEBA_API_URL) -> str:
     """Get example sentences from Tatoeba for a Finnish word"""
     
     try:
-        # Tatoeba API endpoint
-        api_url = "https://tatoeba.org/en/api_v0/search"
-        
+        session = session or make_session(user_agent=USER_AGENT)
+
         params = {
             'from': 'fin',  # Finnish
             'to': 'eng',    # English
@@ -24,11 +32,8 @@ def get_tatoeba_examples(finnish_word: str, max_examples: int = 10) -> str:
             'limit': max_examples
         }
         
-        headers = {
-            'User-Agent': 'Finnish-Learning-Tool/1.0 (educational use)'
-        }
-        
-        response = requests.get(api_url, params=params, headers=headers, timeout=15)
+        # Retries 429/5xx and connection errors with exponential backoff
+        response = get_with_retries(session, api_url, limiter, retries=3, params=params, timeout=15)
         
         if response.status_code != 200:
             return f"[HTTP {response.status_code}]"
@@ -77,118 +82,68 @@ def get_tatoeba_examples(finnish_word: str, max_examples: int = 10) -> str:
     except Exception as e:
         return f"[Error: {str(e)[:50]}]"
 
-def load_existing_examples(csv_file: str) -> List[Tuple[str, str, str, str]]:
-    """Load from basic CSV first, then merge in existing examples by position"""
-    basic_file = "finnish_english_translations_google.csv"
-    
-    # Load current basic CSV as source of truth
-    current_words = {}  # position -> (number, finnish, english)
+def fetch_examples_concurrently(words: List[str], max_examples: int = 20, rps: float = 2.0,
+                                workers: int = 4, api_url: str = TATOEBA_API_URL):
+    """
+    Fetch examples for many words with `workers` threads sharing one pooled
+    session, sending at most `rps` requests per second in total.
+    Yields (finnish_word, examples) as results arrive and reports progress.
+    """
+    session = make_session(pool_size=workers, user_agent=USER_AGENT)
+    limiter = TokenBucket(rps, burst=1)
+    started = time.monotonic()
     try:
-        with open(basic_file, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            next(reader, None)  # Skip header
-            for row in reader:
-                if len(row) >= 3:
-                    position = row[0]
-                    current_words[position] = (row[0], row[1], row[2])
-        
-        print(f"Loaded {len(current_words)} words from current basic CSV: {basic_file}")
-        print(f"Last word in current CSV: {list(current_words.values())[-1]}")
-        
-    except FileNotFoundError:
-        print(f"Error: {basic_file} not found!")
-        return []
-    
-    # Load existing examples by position
-    old_examples = {}  # position -> (number, finnish, english, examples)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(get_tatoeba_examples, word, max_examples, session, limiter, api_url): word
+                for word in words
+            }
+            for i, future in enumerate(as_completed(futures), 1):
+                finnish_word = futures[future]
+                examples = future.result()
+                elapsed = time.monotonic() - started
+                remaining = elapsed / i * (len(words) - i)
+                status = examples if examples.startswith("[") else f"{examples.count(chr(10) * 2) + 1} examples"
+                print(f"{i}/{len(words)} ({elapsed:.0f}s elapsed, ~{remaining:.0f}s left): {finnish_word} - {status}")
+                yield finnish_word, examples
+    finally:
+        session.close()
+
+def lookup_examples_offline(words: List[str], index: TatoebaIndex, max_examples: int = 20):
+    """Look up examples in a local Tatoeba dump index; yields (finnish_word, examples) like fetch_examples_concurrently"""
+    for i, finnish_word in enumerate(words, 1):
+        examples = index.lookup(finnish_word, max_examples)
+        status = examples if examples.startswith("[") else f"{examples.count(chr(10) * 2) + 1} examples"
+        print(f"{i}/{len(words)} (offline): {finnish_word} - {status}")
+        yield finnish_word, examples
+
+def import_existing_examples(csv_file: str, cache: ExampleCache) -> int:
+    """Import examples from an existing examples CSV into the cache, keyed by word"""
     try:
         with open(csv_file, 'r', encoding='utf-8') as f:
             reader = csv.reader(f)
             next(reader, None)  # Skip header
-            for row in reader:
-                if len(row) >= 4:
-                    position = row[0]
-                    old_examples[position] = (row[0], row[1], row[2], row[3])
-        
-        print(f"Loaded {len(old_examples)} words from existing examples: {csv_file}")
-        if old_examples:
-            print(f"Last word in examples CSV: {list(old_examples.values())[-1]}")
-        
+            return cache.import_rows((row[1], row[3]) for row in reader if len(row) >= 4)
     except FileNotFoundError:
         print(f"No existing examples file found: {csv_file}")
-    
-    # Build final list by comparing position by position
-    final_words = []
-    preserved_count = 0
-    changed_count = 0
-    
-    for position in sorted(current_words.keys(), key=int):
-        current_number, current_finnish, current_english = current_words[position]
-        
-        if position in old_examples:
-            old_number, old_finnish, old_english, old_examples_text = old_examples[position]
-            
-            # Same word in same position with good examples? Keep them
-            if (current_finnish == old_finnish and 
-                old_examples_text.strip() and 
-                not old_examples_text.startswith("[")):
-                final_words.append((current_number, current_finnish, current_english, old_examples_text))
-                preserved_count += 1
-                print(f"✅ Position {position}: '{current_finnish}' - preserved examples")
-            else:
-                # Different word or bad examples? Reset and get new examples
-                final_words.append((current_number, current_finnish, current_english, ""))
-                changed_count += 1
-                if current_finnish != old_finnish:
-                    print(f"🔄 Position {position}: '{old_finnish}' → '{current_finnish}' - needs new examples")
-                else:
-                    print(f"🔄 Position {position}: '{current_finnish}' - bad examples, needs new ones")
-        else:
-            # New position, needs examples
-            final_words.append((current_number, current_finnish, current_english, ""))
-            changed_count += 1
-            print(f"🆕 Position {position}: '{current_finnish}' - new word, needs examples")
-    
-    print(f"\nSummary:")
-    print(f"✅ Preserved: {preserved_count} words")
-    print(f"🔄 Changed/New: {changed_count} words")
-    print(f"📝 Total: {len(final_words)} words")
-    
-    return final_words
+        return 0
 
-def merge_with_full_csv(existing_examples: dict) -> List[Tuple[str, str, str, str]]:
-    """Merge existing examples with full basic CSV - ONLY include words that exist in basic CSV"""
-    basic_file = "finnish_english_translations_google.csv"
-    all_words = []
-    
-    try:
-        with open(basic_file, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            next(reader, None)  # Skip header
-            for row in reader:
-                if len(row) >= 3:
-                    number = row[0]
-                    if number in existing_examples:
-                        # Use existing examples ONLY if the word still exists in basic CSV
-                        all_words.append(existing_examples[number])
-                        print(f"Preserved examples for word {number}: {row[1]}")
-                    else:
-                        # Add empty examples field for new words
-                        all_words.append((row[0], row[1], row[2], ""))
-                        print(f"New word {number}: {row[1]} (needs examples)")
-        
-        print(f"Merged with current CSV: {len(all_words)} total words")
-        
-        # Show which old words were removed
-        removed_words = set(existing_examples.keys()) - set(word[0] for word in all_words)
-        if removed_words:
-            print(f"Removed {len(removed_words)} words that are no longer in basic CSV: {sorted(removed_words)}")
-        
-        return all_words
-        
-    except FileNotFoundError:
-        print(f"Error: {basic_file} not found!")
-        return []
+def load_words_with_cached_examples(cache: ExampleCache, max_examples: int) -> List[Tuple[str, str, str, str]]:
+    """Load words from the basic CSV and fill in examples from the cache by word, whatever their rank"""
+    words = load_basic_csv()
+    with_examples = []
+    cached_count = 0
+    for number, finnish, english, _ in words:
+        examples = cache.get(finnish, max_examples)
+        if examples is not None:
+            cached_count += 1
+        with_examples.append((number, finnish, english, examples or ""))
+
+    print(f"\nSummary:")
+    print(f"✅ Cached: {cached_count} words")
+    print(f"🆕 Need examples: {len(words) - cached_count} words")
+    print(f"📝 Total: {len(words)} words")
+    return with_examples
 
 def load_basic_csv() -> List[Tuple[str, str, str, str]]:
     """Load words from basic CSV and add empty examples"""
@@ -232,11 +187,26 @@ def save_csv(enriched_words: List[Tuple[str, str, str, str]], output_file: str):
             writer.writerow(row)
 
 def main():
-    output_file = "finnish_english_with_examples.csv"
+    parser = argparse.ArgumentParser(description='Add Tatoeba example sentences to the translated words')
+    parser.add_argument('--output', default='finnish_english_with_examples.csv', help='Path to examples CSV (default: finnish_english_with_examples.csv)')
+    parser.add_argument('--max-examples', type=int, default=20, help='Examples fetched per word (default: 20)')
+    parser.add_argument('--rps', type=float, default=2.0, help='Maximum Tatoeba requests per second (default: 2)')
+    parser.add_argument('--workers', type=int, default=4, help='Maximum requests in flight at once (default: 4)')
+    parser.add_argument('--api-url', default=TATOEBA_API_URL, help='Tatoeba search endpoint, e.g. a local mock for testing')
+    parser.add_argument('--cache', default=CACHE_FILE, help=f'Path to the example cache database (default: {CACHE_FILE})')
+    parser.add_argument('--dump-dir', help='Directory with Tatoeba sentence/link exports; look examples up offline instead of calling the API')
+    parser.add_argument('--dump-index', default=INDEX_FILE, help=f'Path to the offline Tatoeba index database (default: {INDEX_FILE})')
+    args = parser.parse_args()
+
+    output_file = args.output
     
     print("Loading existing data...")
-    # Load existing examples file or fallback to basic CSV
-    all_words = load_existing_examples(output_file)
+    cache = ExampleCache(args.cache)
+    imported = import_existing_examples(output_file, cache)
+    print(f"Example cache: {len(cache)} words ({imported} imported from {output_file})")
+
+    # Examples are looked up by word, so words that only changed rank need no network calls
+    all_words = load_words_with_cached_examples(cache, args.max_examples)
     
     if not all_words:
         return
@@ -246,10 +216,8 @@ def main():
     words_with_examples = []
     
     for number, finnish_word, english_translation, examples in all_words:
-        # Check if examples are missing or empty or error placeholders
-        if (not examples or 
-            examples.strip() == "" or 
-            examples.startswith("[") and examples.endswith("]")):
+        # Words without a cache entry need examples
+        if not examples:
             words_needing_examples.append((number, finnish_word, english_translation, examples))
         else:
             words_with_examples.append((number, finnish_word, english_translation, examples))
@@ -257,24 +225,33 @@ def main():
     print(f"Found {len(words_with_examples)} words with existing examples (will preserve)")
     print(f"Found {len(words_needing_examples)} words needing examples")
     
-    if not words_needing_examples:
-        print("All words already have examples! Nothing to process.")
-        return
-    
-    print(f"Processing {len(words_needing_examples)} words...")
-    
-    # Process words that need examples
-    processed_words = []
+    if words_needing_examples:
+        print(f"Processing {len(words_needing_examples)} words...")
+    else:
+        print("All words already have examples! Only rewriting the file in the current order.")
     
-    for i, (number, finnish_word, english_translation, old_examples) in enumerate(words_needing_examples, 1):
-        print(f"{i}/{len(words_needing_examples)}: {finnish_word}")
-        
-        examples = get_tatoeba_examples(finnish_word, max_examples=20)  # Increased to 20 examples per word
-        processed_words.append((number, finnish_word, english_translation, examples))
-        
-        # Be respectful to Tatoeba API
-        if i < len(words_needing_examples):
-            time.sleep(1.5)
+    # Fetch examples concurrently, staying within the request budget for the Tatoeba API,
+    # or look them up in the local dump index, and cache each result as soon as it arrives
+    unique_words = list(dict.fromkeys(finnish_word for _, finnish_word, _, _ in words_needing_examples))
+    index = None
+    if args.dump_dir:
+        index = TatoebaIndex(args.dump_index)
+        index.update_from_dump(args.dump_dir)
+        results = lookup_examples_offline(unique_words, index, args.max_examples)
+    else:
+        results = fetch_examples_concurrently(unique_words, args.max_examples, args.rps, args.workers, args.api_url)
+    fetched = {}
+    for finnish_word, examples in results:
+        fetched[finnish_word] = examples
+        cache.put(finnish_word, examples, args.max_examples)
+    cache.close()
+    if index:
+        index.close()
+
+    processed_words = [
+        (number, finnish_word, english_translation, fetched[finnish_word])
+        for number, finnish_word, english_translation, _ in words_needing_examples
+    ]
     
     # Combine preserved examples with newly processed ones
     final_words = words_with_examples + processed_words
@@ -286,7 +263,8 @@ def main():
     save_csv(final_words, output_file)
     
     successful = sum(1 for _, _, _, examples in processed_words if not examples.startswith("["))
-    print(f"Done! Processed {successful}/{len(words_needing_examples)} new examples successfully")
+    if processed_words:
+        print(f"Done! Processed {successful}/{len(words_needing_examples)} new examples successfully")
     print(f"Preserved {len(words_with_examples)} existing examples")
     print(f"Total words in file: {len(final_words)}")
     
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Offline Tatoeba example index built from the Tatoeba export files.
+
+The sentence and link exports (https://tatoeba.org/en/downloads) are
+ingested into a local SQLite store with an inverted index from Finnish
+token to sentence ids, joined to the English translations through the
+links. Example lookups then need no network at all.
+
+Supported files in the dump directory (optionally .bz2 compressed):
+  fin_sentences.tsv, eng_sentences.tsv  per-language sentence exports
+  sentences.csv                         all languages, used if the above are missing
+  links.csv                             sentence_id <TAB> translation_id
+
+Dropping a newer dump in the directory and running again only
+re-tokenizes the Finnish sentences that were added or changed.
+"""
+
+import os
+import re
+import bz2
+import csv
+import sqlite3
+
+INDEX_FILE = "tatoeba_index.sqlite"
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def open_dump(path):
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def find_dump_file(dump_dir, *names):
+    for name in names:
+        for candidate in (name, name + '.bz2'):
+            path = os.path.join(dump_dir, candidate)
+            if os.path.exists(path):
+                return path
+    return None
+
+
+def read_tsv(path):
+    with open_dump(path) as f:
+        yield from csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE)
+
+
+class TatoebaIndex:
+    def __init__(self, path=INDEX_FILE):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS fin_sentences (id INTEGER PRIMARY KEY, text TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS eng_sentences (id INTEGER PRIMARY KEY, text TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS links (fin_id INTEGER NOT NULL, eng_id INTEGER NOT NULL,
+                                              PRIMARY KEY (fin_id, eng_id)) WITHOUT ROWID;
+            -- Postings ordered by sentence length, so the shortest examples come first
+            CREATE TABLE IF NOT EXISTS tokens (token TEXT NOT NULL, length INTEGER NOT NULL,
+                                               sentence_id INTEGER NOT NULL,
+                                               PRIMARY KEY (token, length, sentence_id)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS tokens_by_sentence ON tokens (sentence_id);
+            CREATE TABLE IF NOT EXISTS dump_files (name TEXT PRIMARY KEY, size INTEGER, mtime REAL);
+        """)
+        self.conn.commit()
+
+    def dump_changed(self, paths):
+        stored = dict((name, (size, mtime)) for name, size, mtime in
+                      self.conn.execute("SELECT name, size, mtime FROM dump_files"))
+        current = {os.path.basename(p): (os.path.getsize(p), os.path.getmtime(p)) for p in paths}
+        return stored != current
+
+    def update_from_dump(self, dump_dir):
+        """Ingest the export files in dump_dir; does nothing if they have not changed"""
+        fin_path = find_dump_file(dump_dir, 'fin_sentences.tsv')
+        eng_path = find_dump_file(dump_dir, 'eng_sentences.tsv')
+        all_path = find_dump_file(dump_dir, 'sentences.csv')
+        links_path = find_dump_file(dump_dir, 'links.csv', 'fin-eng_links.tsv')
+        if not links_path or not ((fin_path and eng_path) or all_path):
+            raise FileNotFoundError(f"No Tatoeba sentence and link exports found in '{dump_dir}'")
+
+        paths = [p for p in (fin_path, eng_path, links_path) if p] if fin_path and eng_path else [all_path, links_path]
+        if not self.dump_changed(paths):
+            print(f"[OK] Tatoeba index is up to date with '{dump_dir}'")
+            return
+
+        def sentences(lang, path, wanted=None):
+            for row in read_tsv(path):
+                if len(row) >= 3 and row[1] == lang and (wanted is None or int(row[0]) in wanted):
+                    yield int(row[0]), row[2]
+
+        # Finnish sentences: only new or changed ones are re-tokenized
+        fin = dict(sentences('fin', fin_path or all_path))
+        old = dict(self.conn.execute("SELECT id, text FROM fin_sentences"))
+        removed = [(sentence_id,) for sentence_id in old.keys() - fin.keys()]
+        changed = [(sentence_id, text) for sentence_id, text in fin.items() if old.get(sentence_id) != text]
+        del old
+
+        with self.conn:
+            self.conn.executemany("DELETE FROM tokens WHERE sentence_id = ?", removed + [(i,) for i, _ in changed])
+            self.conn.executemany("DELETE FROM fin_sentences WHERE id = ?", removed)
+            self.conn.executemany("INSERT OR REPLACE INTO fin_sentences (id, text) VALUES (?, ?)", changed)
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tokens (token, length, sentence_id) VALUES (?, ?, ?)",
+                ((token, len(text), sentence_id) for sentence_id, text in changed for token in set(tokenize(text)))
+            )
+
+            # Links and English sentences are small next to the token index, so they are replaced
+            links = [(int(row[0]), int(row[1])) for row in read_tsv(links_path)
+                     if len(row) >= 2 and int(row[0]) in fin]
+            linked_eng = {eng_id for _, eng_id in links}
+            eng = dict(sentences('eng', eng_path or all_path, linked_eng))
+            self.conn.execute("DELETE FROM links")
+            self.conn.executemany("INSERT OR IGNORE INTO links (fin_id, eng_id) VALUES (?, ?)",
+                                  [(f, e) for f, e in links if e in eng])
+            self.conn.execute("DELETE FROM eng_sentences")
+            self.conn.executemany("INSERT INTO eng_sentences (id, text) VALUES (?, ?)", eng.items())
+
+            self.conn.execute("DELETE FROM dump_files")
+            self.conn.executemany("INSERT INTO dump_files (name, size, mtime) VALUES (?, ?, ?)",
+                                  [(os.path.basename(p), os.path.getsize(p), os.path.getmtime(p)) for p in paths])
+
+        print(f"[OK] Tatoeba index: {len(fin)} Finnish sentences ({len(changed)} new or changed, "
+              f"{len(removed)} removed), {len(eng)} English translations")
+
+    def lookup(self, finnish_word, max_examples=10):
+        """Return examples in the same format as get_tatoeba_examples(), shortest sentences first"""
+        tokens = tokenize(finnish_word)
+        if not tokens:
+            return "[No examples found]"
+
+        # Walk the postings of the rarest token and check the whole phrase on each sentence
+        rarest = min(set(tokens), key=lambda t: self.conn.execute(
+            "SELECT COUNT(*) FROM tokens WHERE token = ?", (t,)).fetchone()[0])
+        postings = self.conn.execute(
+            "SELECT sentence_id FROM tokens WHERE token = ? ORDER BY length, sentence_id", (rarest,))
+
+        found_any = False
+        examples = []
+        for (sentence_id,) in postings:
+            finnish_sentence = self.conn.execute(
+                "SELECT text FROM fin_sentences WHERE id = ?", (sentence_id,)).fetchone()[0]
+            if len(tokens) > 1 and not contains_phrase(tokenize(finnish_sentence), tokens):
+                continue
+            found_any = True
+            row = self.conn.execute(
+                "SELECT e.text FROM links l JOIN eng_sentences e ON e.id = l.eng_id "
+                "WHERE l.fin_id = ? ORDER BY l.eng_id LIMIT 1", (sentence_id,)).fetchone()
+            if row:
+                examples.append(f"{finnish_sentence.strip()}\n{row[0].strip()}")
+                if len(examples) >= max_examples:
+                    break
+
+        if not found_any:
+            return "[No examples found]"
+        if not examples:
+            return "[No translated examples found]"
+        return "\n\n".join(examples)
+
+    def close(self):
+        self.conn.close()
+
+
+def contains_phrase(sentence_tokens, phrase_tokens):
+    n = len(phrase_tokens)
+    return any(sentence_tokens[i:i + n] == phrase_tokens for i in range(len(sentence_tokens) - n + 1))
@@ -1,6 +1,14 @@
 #!/usr/bin/env python3
+import os
 import re
+import json
+import shutil
 import argparse
+from functools import lru_cache
+
+CHUNK_SIZE = 1 << 20  # characters read per chunk from the input
+MAX_BUFFER_CHUNKS = 8  # chunks to wait for a safe line break before splitting at a space
+COPY_BUFFER_SIZE = 1 << 20
 
 def read_cleaning_blacklist(blacklist_file):
     """Read blacklisted words and phrases for cleaning"""
@@ -16,56 +24,224 @@ def read_cleaning_blacklist(blacklist_file):
         print(f"Warning: Cleaning blacklist file '{blacklist_file}' not found. Proceeding without cleaning blacklist.")
         return []
 
+HTML_TAG_PATTERN = r'<[^>]+>'
+URL_PATTERN = r'https?://[^\s<]+'  # stops at '<' since a tag right after a URL is not part of it
+
+def is_blacklisted_word(item):
+    """Words (only letters) are removed case-insensitively as whole words, anything else literally"""
+    return re.match(r'^[a-zA-Z]+$', item) is not None
+
+def trie_pattern(items, ignore_case=False):
+    """
+    Turn literal strings into a regex alternation factored as a trie, so a
+    position is rejected after comparing a single character per first letter.
+    """
+    trie = {}
+    for item in items:
+        node = trie
+        for char in (item.lower() if ignore_case else item):
+            node = node.setdefault(char, {})
+        node[''] = {}  # end of an item
+
+    def char_pattern(char):
+        if ignore_case and char.upper() != char:
+            return f'[{char}{char.upper()}]'
+        return re.escape(char)
+
+    def node_pattern(node):
+        children = [char_pattern(char) + node_pattern(child) for char, child in sorted(node.items()) if char]
+        if not children:
+            return ''
+        body = children[0] if len(children) == 1 else '(?:' + '|'.join(children) + ')'
+        # Greedy optional tail, so the longest item wins (e.g. 'Sannan' over 'Sanna')
+        return f'(?:{body})?' if '' in node else body
+
+    return node_pattern(trie)
+
+@lru_cache(maxsize=8)
+def compile_cleaning_pattern(cleaning_blacklist=()):
+    """
+    Build one regex matching any run of whitespace, HTML tags, URLs and blacklisted
+    items, so the whole text is cleaned in a single re.sub pass.
+    """
+    words = {item for item in cleaning_blacklist if is_blacklisted_word(item)}
+    symbols = {item for item in cleaning_blacklist if not is_blacklisted_word(item)}
+    single_chars = ''.join(sorted(re.escape(item) for item in symbols if len(item) == 1))
+    phrases = {item for item in symbols if len(item) > 1}
+
+    alternatives = [HTML_TAG_PATTERN, URL_PATTERN]
+    if phrases:
+        alternatives.append(trie_pattern(phrases))
+    if words:
+        # Blacklisted word characters (digits) are removed as well, so they must
+        # not stop a neighbouring blacklisted word from matching as a whole word
+        removed_word_chars = ''.join(re.escape(item) for item in symbols if len(item) == 1 and re.match(r'\w', item))
+        word_char = f'[^\\W{removed_word_chars}]' if removed_word_chars else r'\w'
+        first_letters = ''.join(sorted({c for word in words for c in (word[0].lower(), word[0].upper())}))
+        alternatives.append(f'(?=[{first_letters}])(?<!{word_char})(?:{trie_pattern(words, ignore_case=True)})(?!{word_char})')
+    # Single characters last, after the longer items that may start with them
+    alternatives.append(f'[{single_chars}\\s]')
+    return re.compile('(?:' + '|'.join(alternatives) + ')+')
+
 def clean_text(text, cleaning_blacklist=None):
-    # Remove HTML tags
-    text = re.sub(r'<[^>]+>', ' ', text)
-    
-    # Remove URLs (http/https links)
-    text = re.sub(r'https?://\S+', ' ', text)
-    
-    # Remove blacklisted words and phrases if provided
-    if cleaning_blacklist:
-        for item in cleaning_blacklist:
-            # Use word boundaries for whole words, or direct replacement for symbols/phrases
-            if re.match(r'^[a-zA-Z]+$', item):  # If it's a word (only letters)
-                text = re.sub(r'\b' + re.escape(item) + r'\b', ' ', text, flags=re.IGNORECASE)
-            else:  # For symbols, punctuation, or phrases
-                text = text.replace(item, ' ')
-    
-    # Collapse multiple whitespace into single spaces
-    text = re.sub(r'\s+', ' ', text)
+    # Remove HTML tags, URLs and blacklisted words and phrases, collapsing
+    # everything removed together with surrounding whitespace into single spaces
+    pattern = compile_cleaning_pattern(tuple(cleaning_blacklist or ()))
+    text = pattern.sub(' ', text)
     # Convert to lowercase and strip leading/trailing spaces
     return text.lower().strip()
 
+def phrase_spanning(buffer, pos, phrases):
+    """
+    Start of the leftmost occurrence of one of phrases that contains pos, or -1.
+    An occurrence cut off by the end of the buffer counts, since it may complete in the next chunk.
+    """
+    for start in range(max(0, pos - max(map(len, phrases), default=0) + 1), pos):
+        for phrase in phrases:
+            if start + len(phrase) > pos and (buffer.startswith(phrase, start) or (
+                    start + len(phrase) > len(buffer) and phrase.startswith(buffer[start:]))):
+                return start
+    return -1
+
+def find_safe_cut(buffer, separators='\n', phrases=()):
+    """
+    Return a position where the buffer can be split without cutting through
+    anything clean_text removes, or -1 if there is none yet.
+    The position is at one of separators and neither inside an unclosed HTML tag
+    nor inside one of phrases, the blacklist items that contain whitespace.
+    URLs end at whitespace and no other item contains any, so that is enough.
+    """
+    def last_separator(end):
+        return max(buffer.rfind(separator, 0, end) for separator in separators)
+
+    cut = last_separator(len(buffer))
+    while cut > 0:
+        # A '<' after the last '>' before the cut may open a tag that closes later
+        open_tag = buffer.find('<', buffer.rfind('>', 0, cut) + 1, cut)
+        if open_tag != -1:
+            cut = last_separator(open_tag)
+            continue
+        phrase_start = phrase_spanning(buffer, cut, phrases)
+        if phrase_start == -1:
+            return cut
+        cut = last_separator(phrase_start)
+    return -1
+
+def clean_stream(infile, cleaning_blacklist=None, chunk_size=CHUNK_SIZE):
+    """
+    Clean a text file chunk by chunk, yielding the cleaned pieces in order.
+    Joined with single spaces they equal clean_text() of the whole file.
+    """
+    phrases = [item for item in cleaning_blacklist or () if any(char.isspace() for char in item)]
+    buffer = ''
+    while True:
+        chunk = infile.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        cut = find_safe_cut(buffer, '\n', phrases)
+        if cut == -1:
+            if len(buffer) < MAX_BUFFER_CHUNKS * chunk_size:
+                continue
+            # No safe line break for a long stretch: fall back to other whitespace
+            cut = find_safe_cut(buffer, ' \t', phrases)
+            if cut == -1:
+                continue
+        cleaned = clean_text(buffer[:cut], cleaning_blacklist)
+        buffer = buffer[cut:]
+        if cleaned:
+            yield cleaned
+    cleaned = clean_text(buffer, cleaning_blacklist)
+    if cleaned:
+        yield cleaned
+
+def commit_append(pending_path, journal_path, output_path, consumed_path, dataset_size):
+    """
+    Append the pending cleaned text to the dataset and delete the consumed input.
+    Safe to repeat: the dataset is first cut back to its size before the append.
+    """
+    with open(output_path, 'ab') as outfile:
+        outfile.truncate(dataset_size)
+        with open(pending_path, 'rb') as pending:
+            shutil.copyfileobj(pending, outfile, COPY_BUFFER_SIZE)
+        outfile.flush()
+        os.fsync(outfile.fileno())
+    if os.path.exists(consumed_path):
+        os.remove(consumed_path)
+    # The journal goes before the pending text it refers to, so it never points at a missing file
+    os.remove(journal_path)
+    os.remove(pending_path)
+
+def recover_interrupted_append(output_path):
+    """Finish an append that was interrupted after its cleaned text was fully written"""
+    journal_path = output_path + '.journal'
+    pending_path = output_path + '.pending'
+    if os.path.exists(journal_path):
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            journal = json.load(f)
+        print(f"[INFO] Finishing an interrupted append of '{journal['input']}' to '{output_path}'")
+        commit_append(pending_path, journal_path, output_path, journal['input'], journal['dataset_size'])
+    elif os.path.exists(pending_path):
+        # Cleaning was interrupted before the append started: the consumed input is still intact
+        os.remove(pending_path)
+
+def append_cleaned(consumed_path, output_path, cleaning_blacklist, chunk_size=CHUNK_SIZE):
+    """Clean a consumed input file, append it to the dataset and delete it; returns the characters added"""
+    # Clean the input chunk by chunk into a pending file next to the dataset
+    pending_path = output_path + '.pending'
+    journal_path = output_path + '.journal'
+    added = 0
+    with open(consumed_path, 'r', encoding='utf-8') as infile, \
+            open(pending_path, 'w', encoding='utf-8', buffering=COPY_BUFFER_SIZE) as pending:
+        for cleaned in clean_stream(infile, cleaning_blacklist, chunk_size):
+            # Add a space before each piece to separate it from existing content
+            pending.write(' ' + cleaned)
+            added += len(cleaned) + 1
+        pending.flush()
+        os.fsync(pending.fileno())
+
+    # Record where the dataset ended, then append: a crash from here on is
+    # finished by the next run instead of appending the text twice
+    dataset_size = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+    with open(journal_path, 'w', encoding='utf-8') as f:
+        json.dump({'input': consumed_path, 'dataset_size': dataset_size}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    commit_append(pending_path, journal_path, output_path, consumed_path, dataset_size)
+    return added
+
 def main():
     parser = argparse.ArgumentParser(description='Clean text from input file and append to dataset')
     parser.add_argument('--input', default='text_input.txt', help='Path to input .txt file (default: text_input.txt)')
     parser.add_argument('--output', default='dataset.txt', help='Path to dataset file to append to (default: dataset.txt)')
     parser.add_argument('--cleaning-blacklist', default='cleaning_blacklist.txt', help='Path to cleaning blacklist file (default: cleaning_blacklist.txt)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help=f'Characters read per chunk from the input (default: {CHUNK_SIZE})')
     args = parser.parse_args()
 
-    # Read the input file as UTF-8
-    with open(args.input, 'r', encoding='utf-8') as infile:
-        data = infile.read()
+    recover_interrupted_append(args.output)
 
     # Read the cleaning blacklist
     cleaning_blacklist = read_cleaning_blacklist(args.cleaning_blacklist)
 
-    # Clean the text
-    cleaned = clean_text(data, cleaning_blacklist)
+    # The input is moved aside before it is cleaned, so text written to it
+    # afterwards (e.g. by the scraper) is never lost if a run is interrupted
+    consumed_path = args.input + '.consumed'
+    added = 0
+    if os.path.exists(consumed_path):
+        print(f"[INFO] Cleaning '{consumed_path}' left behind by an interrupted run")
+        added += append_cleaned(consumed_path, args.output, cleaning_blacklist, args.chunk_size)
+    elif not os.path.exists(args.input):
+        print(f"[ERROR] Input file '{args.input}' not found")
+        return
+
+    if os.path.exists(args.input):
+        os.replace(args.input, consumed_path)
+        # Leave an empty input behind for new content
+        open(args.input, 'a', encoding='utf-8').close()
+        added += append_cleaned(consumed_path, args.output, cleaning_blacklist, args.chunk_size)
 
-    # Append the cleaned text to the dataset file
-    with open(args.output, 'a', encoding='utf-8') as outfile:
-        # Add a space before appending to separate from existing content
-        if cleaned:
-            outfile.write(' ' + cleaned)
-    
-    # Clear the input file after successful processing
-    with open(args.input, 'w', encoding='utf-8') as infile:
-        infile.write('')
-    
     print(f"[OK] Cleaned text from '{args.input}' has been appended to '{args.output}'")
-    print(f"[OK] Added {len(cleaned)} characters to the dataset.")
+    print(f"[OK] Added {max(added - 1, 0)} characters to the dataset.")
     print(f"[OK] '{args.input}' has been cleared and is ready for new content.")
 
 if __name__ == '__main__':
@@ -4,13 +4,18 @@ Finnish to English Word Translator using Google Translate (unofficial)
 Alternative approach when LibreTranslate is not working
 """
 
-import requests
 import csv
-import time
 import re
-import urllib.parse
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Tuple
 
+from http_utils import TokenBucket, get_with_retries, make_session
+from translation_cache import CACHE_FILE, TranslationCache
+
+GOOGLE_TRANSLATE_URL = "https://translate.googleapis.com/translate_a/single"
+BATCH_SIZE = 50  # words packed into one translation request
+
 def load_existing_translations(csv_file: str) -> dict:
     """Load existing translations from CSV file to preserve manual edits"""
     existing = {}
@@ -56,74 +61,110 @@ def read_finnish_words(file_path: str) -> List[Tuple[str, str]]:
     
     return words
 
-def translate_with_google_unofficial(text: str) -> str:
+def fetch_google_translation(text: str, session, limiter: TokenBucket = None,
+                             api_url: str = GOOGLE_TRANSLATE_URL) -> List[str]:
+    """Return the translated segments Google sent back for text (empty list on failure)"""
+    params = {'client': 'gtx', 'sl': 'fi', 'tl': 'en', 'dt': 't', 'q': text}
+
+    # Retries 429/5xx and connection errors with exponential backoff
+    response = get_with_retries(session, api_url, limiter, retries=3, params=params, timeout=10)
+    if response.status_code != 200:
+        return []
+
+    result = response.json()
+    # Google's response format: [[[translated_text, original_text, ...], ...], ...]
+    if not result or not result[0]:
+        return []
+    return [segment[0] for segment in result[0] if segment and segment[0]]
+
+def translate_with_google_unofficial(text: str, session=None, limiter: TokenBucket = None,
+                                     api_url: str = GOOGLE_TRANSLATE_URL) -> str:
     """
     Translate using unofficial Google Translate API
     Note: This is a workaround method and may break if Google changes their API
     """
     try:
-        # URL encode the text
-        encoded_text = urllib.parse.quote(text)
-        
-        # Google Translate URL (unofficial method)
-        url = f"https://translate.googleapis.com/translate_a/single?client=gtx&sl=fi&tl=en&dt=t&q={encoded_text}"
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            result = response.json()
-            # Google's response format: [[[translated_text, original_text, ...], ...], ...]
-            if result and len(result) > 0 and len(result[0]) > 0:
-                return result[0][0][0]
-        
+        segments = fetch_google_translation(text, session or make_session(), limiter, api_url)
+        if segments:
+            return segments[0]
         return f"[FAILED: {text}]"
-        
+
     except Exception as e:
         print(f"  Error translating '{text}': {e}")
         return f"[FAILED: {text}]"
 
-def translate_words_batch(words: List[Tuple[str, str]], existing_translations: dict, delay: float = 1.0) -> List[Tuple[str, str, str]]:
-    """Translate a list of words with delay between requests, preserving existing translations"""
-    translated = []
-    new_translations = 0
+class GoogleTranslateBackend:
+    """
+    Translation backend for the unofficial Google Translate API.
+
+    A backend is any object with translate_batch(words) returning one
+    translation (or a "[FAILED: word]" marker) per word, so a local fake
+    can stand in for Google in tests.
+    """
+
+    def __init__(self, api_url: str = GOOGLE_TRANSLATE_URL, rate: float = 4.0, workers: int = 4):
+        self.api_url = api_url
+        self.session = make_session(pool_size=workers)
+        self.limiter = TokenBucket(rate, burst=workers)
+
+    def translate(self, text: str) -> str:
+        return translate_with_google_unofficial(text, self.session, self.limiter, self.api_url)
+
+    def translate_batch(self, words: List[str]) -> List[str]:
+        """
+        Translate many words in one request, one word per line.
+        Google keeps line breaks, so the reply splits back into one line per word;
+        if it does not, the batch is translated word by word instead.
+        """
+        if len(words) > 1:
+            try:
+                segments = fetch_google_translation('\n'.join(words), self.session, self.limiter, self.api_url)
+                lines = [line.strip() for line in ''.join(segments).split('\n')]
+                if len(lines) == len(words) and all(lines):
+                    return lines
+                print(f"  Batch of {len(words)} words came back as {len(lines)} lines, translating one by one")
+            except Exception as e:
+                print(f"  Error translating batch starting with '{words[0]}': {e}, translating one by one")
+        return [self.translate(word) for word in words]
+
+    def close(self):
+        self.session.close()
+
+def translate_words_batch(words: List[Tuple[str, str]], cache: TranslationCache, backend,
+                          workers: int = 4, batch_size: int = BATCH_SIZE) -> List[Tuple[str, str, str]]:
+    """
+    Translate a list of words, using cached translations where they exist.
+    New words are packed into batches of `batch_size` that `workers` threads
+    send through the backend, and each successful translation is written to
+    the cache as soon as its batch arrives.
+    """
+    translations = {}
     preserved_translations = 0
-    
-    total = len(words)
-    for i, (number, finnish_word) in enumerate(words, 1):
-        print(f"Processing {i}/{total}: {finnish_word}")
-        
-        # Check if translation already exists
-        if finnish_word in existing_translations:
-            english_translation = existing_translations[finnish_word]
-            print(f"  -> Using existing: {english_translation}")
+
+    for number, finnish_word in words:
+        cached = cache.get(finnish_word)
+        if cached is not None:
+            translations[finnish_word] = cached
             preserved_translations += 1
-        else:
-            # Only translate if no existing translation
-            print("  -> Translating new word...")
-            
-            # Try translation with retry logic
-            english_translation = None
-            for attempt in range(2):
-                english_translation = translate_with_google_unofficial(finnish_word)
-                if not english_translation.startswith("[FAILED:"):
-                    break
-                print(f"    Retry {attempt + 1}/2 after 3 seconds...")
-                time.sleep(3)
-            
-            print(f"  -> New translation: {english_translation}")
-            new_translations += 1
-            
-            # Add delay only for new translations to be respectful
-            if i < total:
-                time.sleep(delay)
-        
-        translated.append((number, finnish_word, english_translation))
-    
-    print(f"\nSummary: {preserved_translations} existing translations preserved, {new_translations} new translations created")
+
+    new_words = list(dict.fromkeys(word for _, word in words if word not in translations))
+    print(f"Using {preserved_translations} existing translations, translating {len(new_words)} new words...")
+
+    if new_words:
+        batches = [new_words[i:i + batch_size] for i in range(0, len(new_words), batch_size)]
+        done = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(backend.translate_batch, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                for finnish_word, english in zip(futures[future], future.result()):
+                    translations[finnish_word] = english
+                    if not english.startswith("[FAILED:"):
+                        cache.put(finnish_word, english, source='google')
+                    done += 1
+                    print(f"Translated {done}/{len(new_words)}: {finnish_word} -> {english}")
+
+    translated = [(number, finnish_word, translations[finnish_word]) for number, finnish_word in words]
+    print(f"\nSummary: {preserved_translations} existing translations preserved, {len(new_words)} new translations created")
     return translated
 
 def save_to_csv(translated_words: List[Tuple[str, str, str]], output_file: str):
@@ -139,8 +180,18 @@ def save_to_csv(translated_words: List[Tuple[str, str, str]], output_file: str):
             writer.writerow([number, finnish, english])
 
 def main():
-    input_file = "top_finnish_words.txt"
-    output_file = "finnish_english_translations_google.csv"
+    parser = argparse.ArgumentParser(description='Translate the top Finnish words to English')
+    parser.add_argument('--input', default='top_finnish_words.txt', help='Path to top words list (default: top_finnish_words.txt)')
+    parser.add_argument('--output', default='finnish_english_translations_google.csv', help='Path to translations CSV (default: finnish_english_translations_google.csv)')
+    parser.add_argument('--rate', type=float, default=4.0, help='Maximum translation requests per second (default: 4)')
+    parser.add_argument('--workers', type=int, default=4, help='Maximum requests in flight at once (default: 4)')
+    parser.add_argument('--api-url', default=GOOGLE_TRANSLATE_URL, help='Translation endpoint, e.g. a local stub server for testing')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help=f'Words packed into one request, 1 disables batching (default: {BATCH_SIZE})')
+    parser.add_argument('--cache', default=CACHE_FILE, help=f'Path to the translation cache database (default: {CACHE_FILE})')
+    args = parser.parse_args()
+
+    input_file = args.input
+    output_file = args.output
     
     print("Reading Finnish words...")
     words = read_finnish_words(input_file)
@@ -148,10 +199,16 @@ def main():
     
     print("\nLoading existing translations...")
     existing_translations = load_existing_translations(output_file)
+    cache = TranslationCache(args.cache)
+    imported, manual_edits = cache.sync_from_csv(existing_translations)
+    print(f"Translation cache: {len(cache)} words ({imported} imported from CSV, {manual_edits} manual edits picked up)")
     
     print("\nStarting translation using Google Translate (unofficial API)...")
     print("Preserving existing translations, only translating new words.")
-    translated_words = translate_words_batch(words, existing_translations, delay=1.0)
+    backend = GoogleTranslateBackend(args.api_url, args.rate, args.workers)
+    translated_words = translate_words_batch(words, cache, backend, args.workers, args.batch_size)
+    backend.close()
+    cache.close()
     
     print(f"\nSaving translations to {output_file}...")
     save_to_csv(translated_words, output_file)
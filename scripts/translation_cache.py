@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Persistent Finnish -> English translation cache backed by SQLite.
+
+Translations are keyed by the Finnish word, so a word that drops out of
+the top list and comes back later is never translated again. Every entry
+records where it came from, when it was stored and whether it was edited
+by hand, and each new translation is committed as soon as it arrives.
+"""
+
+import sqlite3
+from datetime import datetime
+
+CACHE_FILE = "translation_cache.sqlite"
+
+
+class TranslationCache:
+    def __init__(self, path=CACHE_FILE):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                finnish TEXT PRIMARY KEY,
+                english TEXT NOT NULL,
+                source TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                manual INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, finnish):
+        """Return the cached translation of a word, or None"""
+        row = self.conn.execute(
+            "SELECT english FROM translations WHERE finnish = ?", (finnish,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def __contains__(self, finnish):
+        return self.get(finnish) is not None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    def put(self, finnish, english, source, manual=False):
+        """Store a translation and commit it immediately"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO translations (finnish, english, source, updated_at, manual) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (finnish, english, source, datetime.now().isoformat(timespec='seconds'), int(manual))
+        )
+        self.conn.commit()
+
+    def sync_from_csv(self, csv_translations):
+        """
+        Pick up translations from the CSV that the cache does not know yet,
+        and mark the ones that were edited by hand as manual.
+        Returns (imported, manual_edits).
+        """
+        imported = 0
+        manual_edits = 0
+        now = datetime.now().isoformat(timespec='seconds')
+        for finnish, english in csv_translations.items():
+            if not english or english.startswith("[FAILED:"):
+                continue
+            cached = self.get(finnish)
+            if cached is None:
+                self.conn.execute(
+                    "INSERT INTO translations (finnish, english, source, updated_at, manual) "
+                    "VALUES (?, ?, 'csv', ?, 0)", (finnish, english, now)
+                )
+                imported += 1
+            elif cached != english:
+                self.conn.execute(
+                    "UPDATE translations SET english = ?, source = 'manual', updated_at = ?, manual = 1 "
+                    "WHERE finnish = ?", (english, now, finnish)
+                )
+                manual_edits += 1
+        self.conn.commit()
+        return imported, manual_edits
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Vocabulary store of the new system backed by SQLite.
+
+Replaces new_system/data/top_words_database.json as the place the
+pipeline reads and writes words: one row per word with its frequency
+count (indexed, so rank order needs no sort), and its translation and
+examples in their own tables. Changing a few frequency counts or
+translations only touches those rows instead of rewriting the whole
+JSON file.
+
+The store is the hot tier: only the words of the current top list, which
+is all the deck builders read. Words that drop off the list move to a
+cold archive (a separate SQLite file keyed by word, with translation and
+examples zlib-compressed), and come back from it with one key lookup if
+they return to the list, so rank churn never costs a new translation or
+example lookup. The archive is versioned as a gzipped JSON Lines snapshot
+(new_system/data/cold_words_archive.jsonl.gz, one archived word per
+line), exported together with the JSON and restored from it when the
+archive file is missing, e.g. in a fresh clone.
+
+The store is the authoritative copy and is not versioned. The JSON file
+keeps its shape as the versioned snapshot of it, written only when asked
+for (--export-json here or on merge_frequency_data.py and
+finnish_words_converter.py), so routine updates never rewrite it. The
+store remembers the hash of the JSON it last imported or exported: a
+JSON edited by hand (or updated by git) since then is imported again
+when the store is opened, and is never exported over.
+
+    python scripts\\vocabulary_store.py --import-json new_system\\data\\top_words_database.json
+    python scripts\\vocabulary_store.py --export-json new_system\\data\\top_words_database.json
+    python scripts\\vocabulary_store.py --export-archive new_system\\data\\cold_words_archive.jsonl.gz
+"""
+
+import os
+import gzip
+import json
+import zlib
+import hashlib
+import sqlite3
+import argparse
+
+from json_stream import iter_object_items
+
+STORE_FILE = 'new_system/data/top_words_database.sqlite'
+JSON_FILE = 'new_system/data/top_words_database.json'
+ARCHIVE_FILE = 'new_system/data/cold_words_archive.sqlite'
+ARCHIVE_SNAPSHOT_FILE = 'new_system/data/cold_words_archive.jsonl.gz'
+BATCH_SIZE = 5000
+REPORT_SAMPLE_SIZE = 10  # Added and dropped words listed by name in a merge report
+
+_ENTRY_QUERY = """
+    SELECT w.word, w.phrase_word_count, w.frequency_count, COALESCE(t.english, ''), COALESCE(e.examples, '')
+    FROM words w
+    LEFT JOIN translations t ON t.word_id = w.id
+    LEFT JOIN examples e ON e.word_id = w.id
+"""
+
+
+def make_entry(phrase_word_count, frequency_count, english_translation, examples):
+    """A word's entry in the shape of top_words_database.json"""
+    return {
+        "phrase_word_count": phrase_word_count,
+        "frequency_count": frequency_count,
+        "english_translation": english_translation,
+        "examples": examples
+    }
+
+
+def pack_texts(english_translation, examples):
+    return zlib.compress(json.dumps([english_translation, examples], ensure_ascii=False).encode('utf-8'))
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class VocabularyStore:
+    def __init__(self, path=STORE_FILE, archive_path=None):
+        """archive_path: cold archive that words dropping off the top list move to (see merge_frequencies())"""
+        self.archive_path = archive_path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript("""
+            -- id keeps the order words were added in, which is also the JSON order and breaks frequency ties
+            CREATE TABLE IF NOT EXISTS words (
+                id INTEGER PRIMARY KEY,
+                word TEXT NOT NULL UNIQUE,
+                phrase_word_count INTEGER NOT NULL,
+                frequency_count INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS words_by_frequency ON words (frequency_count DESC, id);
+            -- Only words that have a translation or examples have a row here
+            CREATE TABLE IF NOT EXISTS translations (
+                word_id INTEGER PRIMARY KEY REFERENCES words (id) ON DELETE CASCADE,
+                english TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS examples (
+                word_id INTEGER PRIMARY KEY REFERENCES words (id) ON DELETE CASCADE,
+                examples TEXT NOT NULL
+            );
+            -- SHA-256 of the JSON files last imported or exported, keyed by 'json_sha256:<absolute path>'
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        self.conn.commit()
+        if archive_path is not None:
+            self.conn.execute("ATTACH DATABASE ? AS cold", (archive_path,))
+            self.conn.execute("PRAGMA cold.journal_mode=WAL")
+            # Translation and examples of an archived word, as zlib-compressed JSON [english, examples]
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS cold.archive (
+                    word TEXT PRIMARY KEY,
+                    phrase_word_count INTEGER NOT NULL,
+                    frequency_count INTEGER NOT NULL,
+                    archived_at TEXT NOT NULL,
+                    texts BLOB NOT NULL
+                )
+            """)
+            self.conn.create_function('pack_texts', 2, pack_texts, deterministic=True)
+            self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM words").fetchone()[0]
+
+    def __contains__(self, word):
+        return self.conn.execute("SELECT 1 FROM words WHERE word = ?", (word,)).fetchone() is not None
+
+    def get(self, word):
+        """Return the entry of a word, or None"""
+        row = self.conn.execute(_ENTRY_QUERY + " WHERE w.word = ?", (word,)).fetchone()
+        return make_entry(*row[1:]) if row else None
+
+    def entries(self):
+        """Yield (word, entry) in the order the words were added"""
+        for row in self.conn.execute(_ENTRY_QUERY + " ORDER BY w.id"):
+            yield row[0], make_entry(*row[1:])
+
+    def ranked_entries(self):
+        """Yield (rank, word, entry), most frequent first"""
+        cursor = self.conn.execute(_ENTRY_QUERY + " ORDER BY w.frequency_count DESC, w.id")
+        for rank, row in enumerate(cursor, 1):
+            yield rank, row[0], make_entry(*row[1:])
+
+    def add_words(self, rows):
+        """Add (word, phrase_word_count, frequency_count) rows; words already stored are left alone. Returns the number added"""
+        added = 0
+        with self.conn:
+            for batch in _batches(rows):
+                added += self.conn.executemany(
+                    "INSERT OR IGNORE INTO words (word, phrase_word_count, frequency_count) VALUES (?, ?, ?)",
+                    batch).rowcount
+        return added
+
+    def update_frequency_counts(self, counts):
+        """Set the frequency_count of stored words from (word, count) pairs; returns the number updated"""
+        updated = 0
+        with self.conn:
+            for batch in _batches((count, word) for word, count in counts):
+                updated += self.conn.executemany(
+                    "UPDATE words SET frequency_count = ? WHERE word = ?", batch).rowcount
+        return updated
+
+    def merge_frequencies(self, rows, sample_size=REPORT_SAMPLE_SIZE):
+        """
+        Merge a frequency snapshot of (word, phrase_word_count, frequency_count) rows into the store:
+        counts of known words are updated and new words are added in snapshot order. Words missing
+        from the snapshot move to the cold archive if one is attached, otherwise they drop to
+        frequency_count 0; either way their translation and examples are kept, and added words
+        found in the archive get theirs back. Returns the change report: counts of added (of which
+        promoted from the archive), updated, unchanged and dropped words, plus the most frequent
+        added, promoted and dropped words.
+        """
+        archive = self.archive_path is not None
+        with self.conn:
+            self.conn.execute("DROP TABLE IF EXISTS temp.snapshot")
+            self.conn.execute("CREATE TEMP TABLE snapshot (word TEXT PRIMARY KEY, phrase_word_count INTEGER NOT NULL, "
+                              "frequency_count INTEGER NOT NULL, known INTEGER NOT NULL DEFAULT 0)")
+            for batch in _batches(rows):
+                # A word listed twice keeps its first position and its last count, as in a dict
+                self.conn.executemany("INSERT INTO snapshot (word, phrase_word_count, frequency_count) VALUES (?, ?, ?) "
+                                      "ON CONFLICT (word) DO UPDATE SET frequency_count = excluded.frequency_count", batch)
+            self.conn.execute("UPDATE snapshot SET known = 1 WHERE word IN (SELECT word FROM words)")
+
+            # Every query below is a join on the word indexes of the tables
+            report = dict(zip(('added', 'updated', 'unchanged'), self.conn.execute("""
+                SELECT COALESCE(SUM(w.id IS NULL), 0),
+                       COALESCE(SUM(w.frequency_count != s.frequency_count), 0),
+                       COALESCE(SUM(w.frequency_count = s.frequency_count), 0)
+                FROM snapshot s LEFT JOIN words w ON w.word = s.word
+            """).fetchone()))
+            report['added_words'] = [word for word, in self.conn.execute(
+                "SELECT word FROM snapshot WHERE NOT known ORDER BY frequency_count DESC, rowid LIMIT ?",
+                (sample_size,))]
+            promoted = "FROM snapshot s JOIN cold.archive a ON a.word = s.word WHERE NOT s.known"
+            report['promoted'] = self.conn.execute("SELECT COUNT(*) " + promoted).fetchone()[0] if archive else 0
+            report['promoted_words'] = [word for word, in self.conn.execute(
+                "SELECT s.word " + promoted + " ORDER BY s.frequency_count DESC, s.rowid LIMIT ?",
+                (sample_size,))] if archive else []
+            # Without an archive the words stay, at frequency_count 0
+            dropped = "FROM words w WHERE NOT EXISTS (SELECT 1 FROM snapshot s WHERE s.word = w.word)"
+            if not archive:
+                dropped += " AND w.frequency_count != 0"
+            report['dropped'] = self.conn.execute("SELECT COUNT(*) " + dropped).fetchone()[0]
+            report['dropped_words'] = [word for word, in self.conn.execute(
+                "SELECT w.word " + dropped + " ORDER BY w.frequency_count DESC, w.id LIMIT ?", (sample_size,))]
+
+        # Each transaction below writes one database file, ordered so that a crash in between
+        # can leave a word in both tiers but never in neither
+        if archive:
+            with self.conn:
+                self.conn.execute(f"""
+                    INSERT OR REPLACE INTO cold.archive (word, phrase_word_count, frequency_count, archived_at, texts)
+                    SELECT w.word, w.phrase_word_count, w.frequency_count, datetime('now'),
+                           pack_texts(COALESCE(t.english, ''), COALESCE(e.examples, ''))
+                    FROM words w
+                    LEFT JOIN translations t ON t.word_id = w.id
+                    LEFT JOIN examples e ON e.word_id = w.id
+                    WHERE w.id IN (SELECT w.id {dropped})
+                """)
+        with self.conn:
+            if archive:
+                self.conn.execute("DELETE FROM words WHERE id IN (SELECT w.id " + dropped + ")")
+            else:
+                self.conn.execute("UPDATE words SET frequency_count = 0 WHERE id IN (SELECT w.id " + dropped + ")")
+            # WHERE true keeps the parser from reading ON CONFLICT as a join constraint
+            self.conn.execute("""
+                INSERT INTO words (word, phrase_word_count, frequency_count)
+                SELECT word, phrase_word_count, frequency_count FROM snapshot WHERE true ORDER BY rowid
+                ON CONFLICT (word) DO UPDATE SET frequency_count = excluded.frequency_count
+                WHERE frequency_count != excluded.frequency_count
+            """)
+            if archive:
+                restored = [(word, json.loads(zlib.decompress(texts)))
+                            for word, texts in self.conn.execute("SELECT s.word, a.texts " + promoted)]
+                self._set_texts('translations', 'english', ((word, english) for word, (english, _) in restored))
+                self._set_texts('examples', 'examples', ((word, examples) for word, (_, examples) in restored))
+        if archive:
+            with self.conn:
+                self.conn.execute("DELETE FROM cold.archive WHERE word IN (SELECT word FROM snapshot)")
+        self.conn.execute("DROP TABLE temp.snapshot")
+        return report
+
+    def archived(self, word):
+        """Return the archived entry of a word, with its last frequency_count, or None"""
+        row = self.conn.execute("SELECT phrase_word_count, frequency_count, texts FROM cold.archive WHERE word = ?",
+                                (word,)).fetchone()
+        return make_entry(row[0], row[1], *json.loads(zlib.decompress(row[2]))) if row else None
+
+    def archived_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM cold.archive").fetchone()[0]
+
+    def archive_texts(self, rows):
+        """
+        Store the translation and examples of (word, phrase_word_count, english, examples) rows whose
+        word is not in the store in the cold archive: archived words keep their last frequency_count,
+        other words are archived at 0 until a frequency merge promotes them. Returns the number stored.
+        """
+        stored = 0
+        with self.conn:
+            for batch in _batches(rows):
+                stored += self.conn.executemany("""
+                    INSERT INTO cold.archive (word, phrase_word_count, frequency_count, archived_at, texts)
+                    SELECT ?1, ?2, 0, datetime('now'), pack_texts(?3, ?4)
+                    WHERE NOT EXISTS (SELECT 1 FROM words WHERE word = ?1)
+                    ON CONFLICT (word) DO UPDATE SET texts = excluded.texts
+                """, batch).rowcount
+        return stored
+
+    def export_archive(self, snapshot_file):
+        """Write the cold archive as gzipped JSON Lines, one word per line in word order; returns the number of words"""
+        count = 0
+        temp_file = snapshot_file + '.tmp'
+        # mtime=0 keeps the file byte-identical when the archive did not change
+        with open(temp_file, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+            for word, phrase_word_count, frequency_count, archived_at, texts in self.conn.execute(
+                    "SELECT word, phrase_word_count, frequency_count, archived_at, texts FROM cold.archive ORDER BY word"):
+                english_translation, examples = json.loads(zlib.decompress(texts))
+                line = {"word": word, "archived_at": archived_at,
+                        **make_entry(phrase_word_count, frequency_count, english_translation, examples)}
+                f.write((json.dumps(line, ensure_ascii=False) + '\n').encode('utf-8'))
+                count += 1
+        os.replace(temp_file, snapshot_file)
+        return count
+
+    def import_archive(self, snapshot_file):
+        """Add or replace every word of a snapshot written by export_archive(); returns the number of words"""
+        count = 0
+        with self.conn, gzip.open(snapshot_file, 'rt', encoding='utf-8') as f:
+            for batch in _batches(json.loads(line) for line in f if line.strip()):
+                self.conn.executemany("""
+                    INSERT OR REPLACE INTO cold.archive (word, phrase_word_count, frequency_count, archived_at, texts)
+                    VALUES (?, ?, ?, ?, pack_texts(?, ?))
+                """, [(row['word'], row['phrase_word_count'], row['frequency_count'], row['archived_at'],
+                       row['english_translation'], row['examples']) for row in batch])
+                count += len(batch)
+        return count
+
+    def _set_texts(self, table, column, pairs):
+        # An empty text removes the row, so the tables only list words that have one
+        for batch in _batches(pairs):
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO {table} (word_id, {column}) SELECT id, ? FROM words WHERE word = ?",
+                [(text, word) for word, text in batch if text])
+            self.conn.executemany(
+                f"DELETE FROM {table} WHERE word_id = (SELECT id FROM words WHERE word = ?)",
+                [(word,) for word, text in batch if not text])
+
+    def set_translations(self, translations):
+        """Store (word, english) pairs for words in the store"""
+        with self.conn:
+            self._set_texts('translations', 'english', translations)
+
+    def set_examples(self, examples):
+        """Store (word, examples) pairs for words in the store"""
+        with self.conn:
+            self._set_texts('examples', 'examples', examples)
+
+    def put_entries(self, items):
+        """Add or replace whole (word, entry) items in one transaction; returns the number of items"""
+        count = 0
+        with self.conn:
+            for batch in _batches(items):
+                self.conn.executemany("""
+                    INSERT INTO words (word, phrase_word_count, frequency_count) VALUES (?, ?, ?)
+                    ON CONFLICT (word) DO UPDATE SET phrase_word_count = excluded.phrase_word_count,
+                                                     frequency_count = excluded.frequency_count
+                """, [(word, entry.get('phrase_word_count', 0), entry.get('frequency_count', 0))
+                      for word, entry in batch])
+                self._set_texts('translations', 'english',
+                                [(word, entry.get('english_translation', '')) for word, entry in batch])
+                self._set_texts('examples', 'examples', [(word, entry.get('examples', '')) for word, entry in batch])
+                count += len(batch)
+        return count
+
+    def _json_key(self, json_file):
+        return 'json_sha256:' + os.path.abspath(json_file)
+
+    def _record_json(self, json_file, digest):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                              (self._json_key(json_file), digest))
+
+    def json_changed(self, json_file):
+        """True if json_file exists and is not the file this store last imported or exported there"""
+        if not os.path.exists(json_file):
+            return False
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (self._json_key(json_file),)).fetchone()
+        return row is None or row[0] != file_sha256(json_file)
+
+    def import_json(self, json_file):
+        """Add or replace every word of a top_words_database.json file, reading it incrementally"""
+        digest = file_sha256(json_file)
+        with open(json_file, 'rb') as f:
+            imported = self.put_entries((word, entry) for word, entry in iter_object_items(f))
+        self._record_json(json_file, digest)
+        return imported
+
+    def export_json(self, json_file, indent=4, force=False):
+        """
+        Write the store as top_words_database.json, as json.dump(..., ensure_ascii=False, indent=indent) would.
+        Refuses to replace a json_file changed since the store last imported or exported it, unless force is set.
+        """
+        if not force and self.json_changed(json_file):
+            raise FileExistsError(f"{json_file} was changed since it was last imported or exported; "
+                                  f"import it first, or force the export to discard the changes")
+        pad = ' ' * indent
+        temp_file = json_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            f.write('{')
+            separator = '\n'
+            for word, entry in self.entries():
+                body = json.dumps(entry, ensure_ascii=False, indent=indent).replace('\n', '\n' + pad)
+                f.write(f"{separator}{pad}{json.dumps(word, ensure_ascii=False)}: {body}")
+                separator = ',\n'
+            f.write('\n}' if separator != '\n' else '}')
+        digest = file_sha256(temp_file)
+        os.replace(temp_file, json_file)
+        self._record_json(json_file, digest)
+
+    def close(self):
+        self.conn.close()
+
+
+def open_vocabulary(path=STORE_FILE, json_file=JSON_FILE, archive_path=None, archive_snapshot=ARCHIVE_SNAPSHOT_FILE):
+    """
+    Open the store, importing json_file first if the store is still empty or the file
+    was changed (by hand or by git) since the store last imported or exported it.
+    A missing archive is restored from archive_snapshot.
+    """
+    restore_archive = (archive_path is not None and not os.path.exists(archive_path)
+                       and archive_snapshot and os.path.exists(archive_snapshot))
+    store = VocabularyStore(path, archive_path)
+    if restore_archive:
+        try:
+            restored = store.import_archive(archive_snapshot)
+        except Exception:
+            store.close()
+            raise
+        print(f"[OK] Restored {restored} archived words from {archive_snapshot} into {archive_path}")
+    if json_file and os.path.exists(json_file) and (len(store) == 0 or store.json_changed(json_file)):
+        reimport = len(store) > 0
+        try:
+            imported = store.import_json(json_file)
+        except Exception:
+            store.close()
+            raise
+        if reimport:
+            print(f"[INFO] {json_file} changed since it was last imported or exported")
+        print(f"[OK] Imported {imported} words from {json_file} into {path}")
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import or export the vocabulary store as top_words_database.json')
+    parser.add_argument('--store', default=STORE_FILE, help=f'Path to the vocabulary store (default: {STORE_FILE})')
+    parser.add_argument('--import-json', metavar='JSON', help='Add or replace every word of this JSON database')
+    parser.add_argument('--export-json', metavar='JSON', help='Write the store to this JSON database')
+    parser.add_argument('--indent', type=int, default=4, help='Indentation of the exported JSON (default: 4)')
+    parser.add_argument('--force', action='store_true', help='Export even over a JSON changed since its last import or export')
+    parser.add_argument('--archive', default=ARCHIVE_FILE, help=f'Path to the cold archive (default: {ARCHIVE_FILE})')
+    parser.add_argument('--import-archive', metavar='JSONL_GZ', help='Add or replace every archived word of this archive snapshot')
+    parser.add_argument('--export-archive', metavar='JSONL_GZ', help='Write the cold archive to this archive snapshot')
+    args = parser.parse_args()
+
+    if not (args.import_json or args.export_json or args.import_archive or args.export_archive):
+        parser.error('nothing to do, pass --import-json, --export-json, --import-archive and/or --export-archive')
+
+    store = VocabularyStore(args.store, args.archive if args.import_archive or args.export_archive else None)
+    try:
+        if args.import_archive:
+            imported = store.import_archive(args.import_archive)
+            print(f"[OK] Imported {imported} archived words from {args.import_archive}")
+        if args.import_json:
+            imported = store.import_json(args.import_json)
+            print(f"[OK] Imported {imported} words from {args.import_json}")
+        if args.export_archive:
+            exported = store.export_archive(args.export_archive)
+            print(f"[OK] Exported {exported} archived words to {args.export_archive}")
+        if args.export_json:
+            try:
+                store.export_json(args.export_json, args.indent, args.force)
+            except FileExistsError as e:
+                print(f"[ERROR] {e}")
+                return
+            print(f"[OK] Exported {len(store)} words to {args.export_json}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()